@@ -3,16 +3,61 @@ import sqlite3
 import sys
 import os
 import json
-import platform
+import math
+import time
+import array
+import bisect
+import atexit
+import base64
+import collections
+import contextlib
+import functools
+import itertools
+import re
+import unicodedata
+import zlib
+import threading
 
 # --- Default Configuration ---
 DEFAULT_MAX_MATCHES = 3
 CONFIG_FILENAME = "lyrics-search.conf"
+INDEX_FILENAME = "lyrics-index.sqlite3"
+COMPACT_FILENAME = "lyrics-compact.sqlite3"
+DEFAULT_SERVE_CONNECTIONS = 4
+DEFAULT_SERVE_PORT = 8765
+ASYNC_PROGRESS_STEPS = 1000 # SQLite VM steps between cancellation checks of async queries
+DEFAULT_WORKERS = 1
+DEFAULT_CHUNK_SIZE = 64
+DEFAULT_RESULT_CACHE_ENTRIES = 1000
+DEFAULT_RESULT_CACHE_BYTES = 16 * 1024 * 1024
+TEMP_STORE_NAMES = ("default", "file", "memory") # PRAGMA temp_store values 0, 1, 2
+DEFAULT_POPULARITY_WEIGHT = 1.0
+DEFAULT_EXPORT_BATCH_ROWS = 10000 # Rows per record batch of 'export' (bounds its memory)
+DEFAULT_STARTUP_IMPORT_BUDGET_MS = 50 # Import of this module (-X importtime), see 'startup-check'
+DEFAULT_STARTUP_LOOKUP_BUDGET_MS = 75 # Wall clock of 'lookup' above a bare interpreter start
 
 # --- Variables for loaded/current configuration ---
 current_db_path = None
 current_max_matches = DEFAULT_MAX_MATCHES
+current_index_path = None # None = default location in the data directory
+current_mmap_size = None # None = SQLite default (PRAGMA mmap_size)
+current_cache_size = None # None = SQLite default (PRAGMA cache_size, negative = KiB)
+current_serve_connections = DEFAULT_SERVE_CONNECTIONS
+current_workers = DEFAULT_WORKERS # Worker processes for batch lookups, 0 = one per CPU core
+current_result_cache_entries = DEFAULT_RESULT_CACHE_ENTRIES # 0 = result cache disabled
+current_result_cache_bytes = DEFAULT_RESULT_CACHE_BYTES
+current_result_cache_file = None # None = cache lives only as long as the process
+current_compact_db_path = None # None = default location in the data directory
+current_profile = False # Log per-phase timings of every search
+current_profile_log = None # None = timings go to stderr
+current_slow_query_ms = 0 # Log query + plan of searches slower than this, 0 = off
+current_temp_store = None # None = SQLite default (PRAGMA temp_store)
+current_read_only = True # Open the database with mode=ro
+current_immutable = False # immutable=1: no locking, only for a dump that never changes while in use
+current_rank_weights = None # None = bm25 with equal column weights
+current_popularity_weight = DEFAULT_POPULARITY_WEIGHT # 0 = ignore the popularity index
 config_file_path = ""
+_config_stamp = None # (mtime, size) of the config file when it was last parsed
 config_available = False
 
 # --- Configuration for DB Schema  ---
@@ -22,10 +67,39 @@ TRACK_TITLE_COL = "name"
 TRACK_ARTIST_COL = "artist_name"
 
 LYRICS_TABLE = "lyrics"
+LYRICS_ID_COL = "id"
 LYRICS_FK_COL = "track_id"
 LYRICS_TEXT_COL = "plain_lyrics"
+LYRICS_SYNCED_COL = "synced_lyrics" # LRC text ("[mm:ss.xx] line")
+SYNCED_CACHE_ENTRIES = 256 # Parsed synced lyrics kept in memory (hot tracks)
 
 FTS_TABLE = "tracks_fts"
+
+# --- Configuration for the Sidecar Index DB (the dump itself is never modified) ---
+INDEX_SCHEMA = "idx" # Name under which the sidecar DB is attached
+INDEX_META_TABLE = "index_meta"
+LYRICS_INDEX_TEXT_TABLE = "lyrics_text"
+LYRICS_INDEX_FTS_TABLE = "lyrics_fts"
+FUZZY_INDEX_TEXT_TABLE = "track_text" # Folded title/artist per track id
+FUZZY_INDEX_FTS_TABLE = "fuzzy_fts"
+FUZZY_INDEX_VOCAB_TABLE = "fuzzy_vocab"
+FUZZY_INDEX_GRAMS_TABLE = "fuzzy_grams" # Trigram -> number of tracks containing it (copy of the vocab table)
+FUZZY_MAX_GRAMS = 6 # Rarest query trigrams used to find candidates
+FUZZY_CANDIDATES = 200 # Candidates (sharing the most of these trigrams) re-ranked by similarity
+EXACT_INDEX_KEYS_TABLE = "track_keys" # Folded (title, artist) -> track id
+POPULARITY_SCORES_TABLE = "track_scores" # Track id -> popularity/quality score
+PHRASE_INDEX_TEXT_TABLE = "phrase_text" # Lyrics per lyrics id, content of the phrase index
+PHRASE_INDEX_FTS_TABLE = "phrase_fts" # Word tokens with positions
+PHRASE_SNIPPET_TOKENS = 16 # Words of context returned around a lyric match
+PHRASE_HIGHLIGHT = ("**", "**") # Marks the matched words in the context
+FINGERPRINT_INDEX_TABLE = "lyrics_fingerprints" # Lyrics id -> track id, fingerprint of the lyrics (copies share it)
+LYRICS_PAGE_MODES = {'lyrics': 'phrase', 'lyrics-words': 'words'} # Page token mode -> match kind of lookup --lyrics
+
+# --- Configuration for the Compact DB (slim copy of the dump, see build_compact_db) ---
+COMPACT_FORMAT_VERSION = "2" # 2: with synced lyrics
+COMPACT_META_TABLE = "compact_meta"
+COMPACT_LYRICS_ROWS_TABLE = "lyrics_rows"
+COMPACT_LYRICS_TEXTS_TABLE = "lyrics_texts"
 # -------------------------------------------------------------------
 
 # --- ASCII Art Banner ---
@@ -66,6 +140,7 @@ The output is the first result that is found, together with the song name, artis
 
 def clear_screen():
     """Clears the terminal screen OS-independently."""
+    import platform
     os_name = platform.system()
     if os_name == "Windows":
         os.system('cls')
@@ -80,24 +155,143 @@ def get_config_path():
         ".config",
         "lyrics-search"
     )
-    os.makedirs(config_dir, exist_ok=True)
-    return os.path.join(config_dir, CONFIG_FILENAME)
+    return os.path.join(config_dir, CONFIG_FILENAME) # Directory is created by save_config, not on every read
+
+def get_data_dir():
+    """Determines the directory for generated data (indexes) under ~/.local/share/lyrics-search/."""
+    return os.path.join(
+        os.path.expanduser("~"),
+        ".local",
+        "share",
+        "lyrics-search"
+    )
+
+def get_index_path():
+    """Returns the path of the sidecar index database (configured or default)."""
+    if current_index_path:
+        return current_index_path
+    return os.path.join(get_data_dir(), INDEX_FILENAME)
+
+def get_compact_db_path():
+    """Returns the path of the compact database (configured or default)."""
+    if current_compact_db_path:
+        return current_compact_db_path
+    return os.path.join(get_data_dir(), COMPACT_FILENAME)
+
+def parse_int_setting(value, minimum=None):
+    """Parses an integer config value. Returns None for invalid values (caller keeps its default)."""
+    try:
+        val_int = int(value)
+    except ValueError:
+        return None
+    if minimum is not None and val_int < minimum:
+        return None
+    return val_int
+
+def parse_float_setting(value, minimum=None):
+    """Parses a float config value. Returns None for invalid values (caller keeps its default)."""
+    try:
+        val_float = float(value)
+    except ValueError:
+        return None
+    if minimum is not None and val_float < minimum:
+        return None
+    return val_float
+
+def parse_rank_weights(value):
+    """Parses rank_weights: 'name_lower:10, artist_name_lower:5' (unlisted columns weigh 1)
+    or '10, 1, 5' (in the column order of the FTS table). Returns a tuple or None for invalid values."""
+    weights = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        column, _, weight = part.rpartition(':')
+        weight = parse_float_setting(weight, minimum=0.0)
+        if weight is None:
+            return None
+        weights.append((column.strip(), weight) if column else weight)
+    if not weights or len({isinstance(weight, tuple) for weight in weights}) > 1:
+        return None # Empty or mixed forms
+    return tuple(weights)
+
+def format_rank_weights(weights):
+    return ', '.join(f"{weight[0]}:{weight[1]:g}" if isinstance(weight, tuple) else f"{weight:g}" for weight in weights)
+
+def parse_temp_store(value):
+    """Parses temp_store (default/file/memory or 0/1/2). Returns None for invalid values."""
+    value = value.strip().lower()
+    if value in TEMP_STORE_NAMES:
+        return TEMP_STORE_NAMES.index(value)
+    val_int = parse_int_setting(value, minimum=0)
+    return val_int if val_int is not None and val_int < len(TEMP_STORE_NAMES) else None
+
+def parse_bool_setting(value):
+    """Parses a yes/no config value (true/yes/on/1)."""
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
 
 def load_config():
     """Loads the configuration from the file."""
-    global current_db_path, current_max_matches, config_file_path, config_available
+    global current_db_path, current_max_matches, current_index_path, config_file_path, config_available, \
+        current_mmap_size, current_cache_size, current_serve_connections, current_workers, \
+        current_result_cache_entries, current_result_cache_bytes, current_result_cache_file, \
+        current_compact_db_path, current_profile, current_profile_log, current_slow_query_ms, \
+        current_temp_store, current_read_only, current_immutable, current_rank_weights, \
+        current_popularity_weight, _config_stamp
     config_file_path = get_config_path()
+    try:
+        stat = os.stat(config_file_path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        stamp = None
+    if stamp is not None and stamp == _config_stamp:
+        return config_available # Unchanged since it was parsed (e.g. worker processes), keep the values
+    _config_stamp = None
     config_available = False # Reset flag
 
     # Reset to defaults in case the file doesn't exist or is faulty
     current_db_path = None
     current_max_matches = DEFAULT_MAX_MATCHES
-
-    if os.path.exists(config_file_path):
+    current_index_path = None
+    current_mmap_size = None
+    current_cache_size = None
+    current_serve_connections = DEFAULT_SERVE_CONNECTIONS
+    current_workers = DEFAULT_WORKERS
+    current_result_cache_entries = DEFAULT_RESULT_CACHE_ENTRIES
+    current_result_cache_bytes = DEFAULT_RESULT_CACHE_BYTES
+    current_result_cache_file = None
+    current_compact_db_path = None
+    current_profile = False
+    current_profile_log = None
+    current_slow_query_ms = 0
+    current_temp_store = None
+    current_read_only = True
+    current_immutable = False
+    current_rank_weights = None
+    current_popularity_weight = DEFAULT_POPULARITY_WEIGHT
+
+    if stamp is not None:
         try:
             with open(config_file_path, 'r', encoding='utf-8') as f:
                 temp_db_path = None
                 temp_max_matches = DEFAULT_MAX_MATCHES
+                temp_index_path = None
+                temp_mmap_size = None
+                temp_cache_size = None
+                temp_serve_connections = DEFAULT_SERVE_CONNECTIONS
+                temp_workers = DEFAULT_WORKERS
+                temp_result_cache_entries = DEFAULT_RESULT_CACHE_ENTRIES
+                temp_result_cache_bytes = DEFAULT_RESULT_CACHE_BYTES
+                temp_result_cache_file = None
+                temp_compact_db_path = None
+                temp_profile = False
+                temp_profile_log = None
+                temp_slow_query_ms = 0
+                temp_temp_store = None
+                temp_read_only = True
+                temp_immutable = False
+                temp_rank_weights = None
+                temp_popularity_weight = DEFAULT_POPULARITY_WEIGHT
 
                 for line in f:
                     line = line.strip()
@@ -123,12 +317,70 @@ def load_config():
                                  # Quietly ignore invalid values during load
                                  pass
                                  # print(f"WARNING: Invalid value for max_matches ('{value}') in '{CONFIG_FILENAME}', using default ({DEFAULT_MAX_MATCHES}).", file=sys.stderr)
+                        elif key == 'index_path':
+                            temp_index_path = value or None
+                        elif key == 'mmap_size':
+                            temp_mmap_size = parse_int_setting(value, minimum=0)
+                        elif key == 'cache_size':
+                            temp_cache_size = parse_int_setting(value)
+                        elif key == 'serve_connections':
+                            temp_serve_connections = parse_int_setting(value, minimum=1) or DEFAULT_SERVE_CONNECTIONS
+                        elif key == 'workers':
+                            temp_workers = parse_int_setting(value, minimum=0)
+                            if temp_workers is None:
+                                temp_workers = DEFAULT_WORKERS
+                        elif key == 'result_cache_entries':
+                            temp_result_cache_entries = parse_int_setting(value, minimum=0)
+                            if temp_result_cache_entries is None:
+                                temp_result_cache_entries = DEFAULT_RESULT_CACHE_ENTRIES
+                        elif key == 'result_cache_bytes':
+                            temp_result_cache_bytes = parse_int_setting(value, minimum=1) or DEFAULT_RESULT_CACHE_BYTES
+                        elif key == 'result_cache_file':
+                            temp_result_cache_file = value or None
+                        elif key == 'compact_db_path':
+                            temp_compact_db_path = value or None
+                        elif key == 'profile':
+                            temp_profile = parse_bool_setting(value)
+                        elif key == 'profile_log':
+                            temp_profile_log = value or None
+                        elif key == 'slow_query_ms':
+                            temp_slow_query_ms = parse_int_setting(value, minimum=0) or 0
+                        elif key == 'temp_store':
+                            temp_temp_store = parse_temp_store(value)
+                        elif key == 'read_only':
+                            temp_read_only = parse_bool_setting(value)
+                        elif key == 'immutable':
+                            temp_immutable = parse_bool_setting(value)
+                        elif key == 'rank_weights':
+                            temp_rank_weights = parse_rank_weights(value)
+                        elif key == 'popularity_weight':
+                            temp_popularity_weight = parse_float_setting(value, minimum=0.0)
+                            if temp_popularity_weight is None:
+                                temp_popularity_weight = DEFAULT_POPULARITY_WEIGHT
 
                 # Update global variables only if values were found
                 current_db_path = temp_db_path
                 current_max_matches = temp_max_matches
+                current_index_path = temp_index_path
+                current_mmap_size = temp_mmap_size
+                current_cache_size = temp_cache_size
+                current_serve_connections = temp_serve_connections
+                current_workers = temp_workers
+                current_result_cache_entries = temp_result_cache_entries
+                current_result_cache_bytes = temp_result_cache_bytes
+                current_result_cache_file = temp_result_cache_file
+                current_compact_db_path = temp_compact_db_path
+                current_profile = temp_profile
+                current_profile_log = temp_profile_log
+                current_slow_query_ms = temp_slow_query_ms
+                current_temp_store = temp_temp_store
+                current_read_only = temp_read_only
+                current_immutable = temp_immutable
+                current_rank_weights = temp_rank_weights
+                current_popularity_weight = temp_popularity_weight
                 # Config is considered available if the file exists (even if path is invalid)
                 config_available = True
+                _config_stamp = stamp
 
         except IOError as e:
             print(f"ERROR reading config '{config_file_path}': {e}", file=sys.stderr)
@@ -149,6 +401,40 @@ def save_config(db_path, max_matches):
             if db_path:
                 f.write(f"db_path={db_path}\n")
             f.write(f"max_matches={max_matches}\n")
+            if current_index_path:
+                f.write(f"index_path={current_index_path}\n")
+            if current_mmap_size is not None:
+                f.write(f"mmap_size={current_mmap_size}\n")
+            if current_cache_size is not None:
+                f.write(f"cache_size={current_cache_size}\n")
+            if current_serve_connections != DEFAULT_SERVE_CONNECTIONS:
+                f.write(f"serve_connections={current_serve_connections}\n")
+            if current_workers != DEFAULT_WORKERS:
+                f.write(f"workers={current_workers}\n")
+            if current_result_cache_entries != DEFAULT_RESULT_CACHE_ENTRIES:
+                f.write(f"result_cache_entries={current_result_cache_entries}\n")
+            if current_result_cache_bytes != DEFAULT_RESULT_CACHE_BYTES:
+                f.write(f"result_cache_bytes={current_result_cache_bytes}\n")
+            if current_result_cache_file:
+                f.write(f"result_cache_file={current_result_cache_file}\n")
+            if current_compact_db_path:
+                f.write(f"compact_db_path={current_compact_db_path}\n")
+            if current_profile:
+                f.write("profile=true\n")
+            if current_profile_log:
+                f.write(f"profile_log={current_profile_log}\n")
+            if current_slow_query_ms:
+                f.write(f"slow_query_ms={current_slow_query_ms}\n")
+            if current_temp_store is not None:
+                f.write(f"temp_store={TEMP_STORE_NAMES[current_temp_store]}\n")
+            if not current_read_only:
+                f.write("read_only=false\n")
+            if current_immutable:
+                f.write("immutable=true\n")
+            if current_rank_weights:
+                f.write(f"rank_weights={format_rank_weights(current_rank_weights)}\n")
+            if current_popularity_weight != DEFAULT_POPULARITY_WEIGHT:
+                f.write(f"popularity_weight={current_popularity_weight}\n")
         # Use stderr for info messages in case stdout is used by lookup
         print(f"INFO: Configuration saved to '{config_file_path}'", file=sys.stderr)
         config_available = True # Config is available after successful save
@@ -208,27 +494,65 @@ def run_setup():
             except ValueError:
                 print("ERROR: Please enter a valid number.")
 
+    if input("Change advanced SQLite settings (memory, I/O)? (y/N): ").strip().lower() == 'y':
+        ask_sqlite_settings()
+
     # Save and update global variables
     if save_config(new_db_path, new_max_matches):
         current_db_path = new_db_path
         current_max_matches = new_max_matches
         print("Setup completed successfully.")
+        check_database_setup(new_db_path)
     else:
         print("Setup could not be saved.")
 
     wait_for_enter("[ Press Enter to return to menu ]")
 
 
+def ask_setting(prompt, current, parse):
+    """Asks for one setting until parse(answer) accepts it. Empty = keep current, '-' = SQLite default (None)."""
+    while True:
+        user_input = input(f"{prompt} (current: {'SQLite default' if current is None else current}, '-' = default): ").strip()
+        if not user_input:
+            return current
+        if user_input == '-':
+            return None
+        value = parse(user_input)
+        if value is not None:
+            return value
+        print("ERROR: Invalid value, please try again.")
+
+def ask_sqlite_settings():
+    """Setup part for mmap_size, cache_size, temp_store and the URI flags (sets the current_* variables)."""
+    global current_mmap_size, current_cache_size, current_temp_store, current_read_only, current_immutable
+    mmap_mib = ask_setting("Memory-mapped I/O in MiB (0 = off)",
+                           None if current_mmap_size is None else current_mmap_size // (1024 * 1024),
+                           lambda value: parse_int_setting(value, minimum=0))
+    current_mmap_size = None if mmap_mib is None else mmap_mib * 1024 * 1024
+    cache_mib = ask_setting("Page cache per connection in MiB",
+                            None if current_cache_size is None else abs(current_cache_size) // 1024,
+                            lambda value: parse_int_setting(value, minimum=1))
+    current_cache_size = None if cache_mib is None else -cache_mib * 1024 # Negative = KiB
+    temp_store = ask_setting("Temporary tables (default/file/memory)",
+                             None if current_temp_store is None else TEMP_STORE_NAMES[current_temp_store],
+                             parse_temp_store)
+    current_temp_store = parse_temp_store(temp_store) if isinstance(temp_store, str) else temp_store
+    current_read_only = input(f"Open the database read-only? (Y/n, current: {'yes' if current_read_only else 'no'}): ").strip().lower() != 'n'
+    current_immutable = input("Treat the database as immutable (faster, only if it never changes while in use)? "
+                              f"(y/N, current: {'yes' if current_immutable else 'no'}): ").strip().lower() == 'y'
+
+
 # --- Interactive Mode: Display ---
 def display_main_menu():
     """Displays the main menu with the new order."""
     print("--- Main Menu ---")
     print("1: Search by Title/Artist (Fast)")
-    print("2: Search within Lyrics (Slower)")
+    print("2: Search within Lyrics (Slower without index)")
     print("3: Setup")
     print("4: Get Database (Instructions)")
     print("5: Use 'lookup' (Instructions)")
-    print("6: Exit Program")
+    print("6: Build Search Indexes")
+    print("7: Exit Program")
     print("-----------------")
 
 def wait_for_enter(message="[ Press Enter to return to menu ]"):
@@ -238,22 +562,29 @@ def wait_for_enter(message="[ Press Enter to return to menu ]"):
     except (EOFError, KeyboardInterrupt):
         print("\nAction cancelled.") # General message
 
-def display_results(found_tracks):
-    """Displays the found tracks and lyrics formatted."""
-    if not found_tracks:
-        print("\nNo matching tracks found.")
-        return
+def display_results(found_tracks, load_lyrics=None, max_matches=None, first_number=1):
+    """Displays the found tracks and lyrics formatted and returns their number.
+    found_tracks can be any iterable (e.g. a generator): each track is printed as soon as it arrives.
+    With load_lyrics(track) the lyrics are only fetched when that track is printed.
+    first_number continues the numbering on later pages."""
+    if max_matches is None:
+        max_matches = current_max_matches
 
-    # Use current_max_matches for display info, not the actual count
-    print(f"\nTop {len(found_tracks)} relevant tracks (max {current_max_matches}) and their lyrics:")
-    print("=" * 40)
+    track_count = 0
     for i, track in enumerate(found_tracks):
+        if i == 0:
+            # Tracks are printed as they arrive, so the header can only give the page size
+            if first_number == 1:
+                print(f"\nTop relevant tracks (max {max_matches}) and their lyrics:")
+            else:
+                print(f"\nNext tracks (max {max_matches}):")
+            print("=" * 40)
+        track_count += 1
         track_id = track.get(TRACK_ID_COL, 'N/A')
         title = track.get(TRACK_TITLE_COL, 'N/A')
         artist = track.get(TRACK_ARTIST_COL, 'N/A')
-        lyrics_text = track.get(LYRICS_TEXT_COL)
 
-        print(f"Track {i + 1} (ID: {track_id})")
+        print(f"Track {first_number + i} (ID: {track_id})")
         print(f"  Title:  {title}")
         print(f"  Artist: {artist}")
         print("-" * 20)
@@ -261,49 +592,391 @@ def display_results(found_tracks):
 
         if 'error' in track:
              print(f"    Error loading ({track['error']})") # Slightly indented
-        elif lyrics_text is not None:
-            for line in lyrics_text.splitlines():
-                print(f"    {line}") # Indent with 4 spaces
-            # Handle empty lyrics (string of length 0) correctly
-            if not lyrics_text:
-                print("    (Empty)")
         else:
-            print("    Not available (or column empty)") # Slightly indented
-        print("=" * 40) # Separator line after each track
+            lyrics_text = load_lyrics(track) if load_lyrics is not None else track.get(LYRICS_TEXT_COL)
+            if lyrics_text is not None:
+                for line in lyrics_text.splitlines():
+                    print(f"    {line}") # Indent with 4 spaces
+                # Handle empty lyrics (string of length 0) correctly
+                if not lyrics_text:
+                    print("    (Empty)")
+            else:
+                print("    Not available (or column empty)") # Slightly indented
+        print("=" * 40, flush=True) # Separator line after each track
+
+    if track_count == 0:
+        print("\nNo matching tracks found." if first_number == 1 else "\nNo more tracks.")
+    else:
+        print(f"{track_count} track(s) found.")
+    return track_count
+
+
+# --- Database Connections ---
+_database_open_modes = {} # Path -> URI flags that were actually used ('' = normal mode after a fallback)
+
+def get_database_uri_flags():
+    """The URI parameters from the config (read_only, immutable)."""
+    flags = []
+    if current_read_only:
+        flags.append('mode=ro')
+    if current_immutable:
+        flags.append('immutable=1')
+    return '&'.join(flags)
+
+def apply_pragmas(conn):
+    """Applies the configured I/O pragmas (mmap_size, cache_size, temp_store) to a connection."""
+    if current_mmap_size is not None:
+        conn.execute(f"PRAGMA mmap_size = {int(current_mmap_size)};")
+    if current_cache_size is not None:
+        conn.execute(f"PRAGMA cache_size = {int(current_cache_size)};")
+    if current_temp_store is not None:
+        conn.execute(f"PRAGMA temp_store = {int(current_temp_store)};")
+
+def open_database(db_path, check_same_thread=True):
+    """Opens the database read-only (falls back to normal mode) with Row access and the configured pragmas.
+    If a compact DB built from this dump exists, it is opened instead (same tables, same results)."""
+    db_path = resolve_search_db(db_path)
+    uri_flags = get_database_uri_flags()
+    try:
+        conn = sqlite3.connect(f'file:{db_path}?{uri_flags}', uri=True, check_same_thread=check_same_thread)
+    except sqlite3.OperationalError:
+        # print("WARNING: Could not open in read-only mode, trying normal mode.", file=sys.stderr)
+        conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+        uri_flags = ''
+    _database_open_modes[db_path] = uri_flags
+    conn.row_factory = sqlite3.Row
+    conn.create_function("lyrics_inflate", 1, inflate_lyrics, deterministic=True) # Used by the compact DB
+    apply_pragmas(conn)
+    return conn
+
+def check_connection_settings(db_path):
+    """Compares the configured connection settings with what a new connection really uses.
+    Returns findings like inspect_database (the SQLite build can cap mmap_size, a fallback drops the URI flags)."""
+    findings = []
+    conn = open_database(db_path)
+    try:
+        actual = {
+            'mmap_size': conn.execute("PRAGMA mmap_size;").fetchone()[0],
+            'cache_size': conn.execute("PRAGMA cache_size;").fetchone()[0],
+            'temp_store': conn.execute("PRAGMA temp_store;").fetchone()[0],
+        }
+    finally:
+        conn.close()
+    for name, configured in (('mmap_size', current_mmap_size), ('cache_size', current_cache_size),
+                             ('temp_store', current_temp_store)):
+        shown = TEMP_STORE_NAMES[actual[name]] if name == 'temp_store' else actual[name]
+        if configured is None:
+            findings.append((True, f"{name} = {shown} (SQLite default)", [], None))
+        elif configured == actual[name]:
+            findings.append((True, f"{name} = {shown} (from config)", [], None))
+        else:
+            findings.append((False, f"{name} = {shown}, but the config sets {configured} (limited by this SQLite build?)", [], None))
+    used_flags = _database_open_modes.get(resolve_search_db(db_path), '')
+    wanted_flags = get_database_uri_flags()
+    if used_flags == wanted_flags:
+        findings.append((True, f"Opened with URI flags: {used_flags or 'none'}", [], None))
+    else:
+        findings.append((False, f"Opened without '{wanted_flags}' (the URI open failed, normal mode was used)", [], None))
+    return findings
+
+_compact_db_checked = {} # Dump fingerprint -> compact DB path or None (checked once per process)
+
+def resolve_search_db(db_path):
+    """Returns the path of the compact DB if it was built from db_path in the current format, else db_path."""
+    try:
+        fingerprint = get_db_fingerprint(db_path)
+    except OSError:
+        return db_path
+    if fingerprint not in _compact_db_checked:
+        compact_path = get_compact_db_path()
+        usable_path = None
+        if os.path.exists(compact_path):
+            try:
+                conn = sqlite3.connect(f'file:{compact_path}?mode=ro', uri=True)
+                try:
+                    meta = dict(conn.execute(f'SELECT key, value FROM "{COMPACT_META_TABLE}";').fetchall())
+                finally:
+                    conn.close()
+                if meta.get('source') == fingerprint and meta.get('format') == COMPACT_FORMAT_VERSION:
+                    usable_path = compact_path
+            except sqlite3.Error as e:
+                print(f"WARNING: Could not use compact database '{compact_path}': {e}", file=sys.stderr)
+        _compact_db_checked[fingerprint] = usable_path
+    return _compact_db_checked[fingerprint] or db_path
+
+def get_db_fingerprint(db_path):
+    """Identifies a dump by path, size and mtime, so indexes built for an older dump are not used."""
+    stat = os.stat(db_path)
+    return f"{os.path.abspath(db_path)}|{stat.st_size}|{int(stat.st_mtime)}"
+
+def attach_index(conn, db_path):
+    """Attaches the sidecar index DB (if it exists, once per connection) and returns the names of the indexes valid for db_path."""
+    index_path = get_index_path()
+    if not os.path.exists(index_path):
+        return set() # Not built yet, nothing to attach (ATTACH would create an empty file)
+    try:
+        if not any(row[1] == INDEX_SCHEMA for row in conn.execute("PRAGMA database_list;")):
+            conn.execute(f'ATTACH DATABASE ? AS "{INDEX_SCHEMA}"', (index_path,))
+        meta_rows = conn.execute(f'SELECT name, source FROM "{INDEX_SCHEMA}"."{INDEX_META_TABLE}"').fetchall()
+    except sqlite3.Error as e:
+        print(f"WARNING: Could not use index database '{index_path}': {e}", file=sys.stderr)
+        return set()
+    fingerprint = get_db_fingerprint(db_path)
+    return {row[0] for row in meta_rows if row[1] == fingerprint}
+
+
+# --- Query Profiling ---
+class QueryProfiler:
+    """Measures the phases of a search (connect, FTS match, details join, ...) and logs them as JSON lines.
+    Only exists while profiling or the slow-query log is enabled; the search code checks
+    'if query_profiler:' so the disabled case costs a single global lookup per phase."""
+
+    def __init__(self, log_path=None, slow_query_ms=0, log_all=True):
+        self.log_path = log_path
+        self.slow_query_ms = slow_query_ms
+        self.log_all = log_all
+        self._local = threading.local() # One running operation per thread (server mode)
+        self._write_lock = threading.Lock()
+
+    def begin(self, operation, query):
+        """Starts timing an operation. Returns False if one is already running (nested calls add their phases to it)."""
+        if getattr(self._local, 'operation', None) is not None:
+            return False
+        now = time.perf_counter()
+        self._local.operation = operation
+        self._local.query = query
+        self._local.start = now
+        self._local.last = now
+        self._local.phases = {}
+        self._local.statements = []
+        return True
+
+    def phase(self, name):
+        """Ends the phase 'name' (the time since the previous phase or begin)."""
+        if getattr(self._local, 'operation', None) is None:
+            return
+        now = time.perf_counter()
+        self._local.phases[name] = self._local.phases.get(name, 0.0) + (now - self._local.last)
+        self._local.last = now
+
+    def statement(self, sql, params):
+        """Remembers an executed SQL statement, for EXPLAIN QUERY PLAN if the operation turns out slow."""
+        if getattr(self._local, 'operation', None) is not None:
+            self._local.statements.append((sql, tuple(params)))
+
+    def finish(self, db_path):
+        """Ends the operation and writes its record (slow operations include the query plans)."""
+        local = self._local
+        if getattr(local, 'operation', None) is None:
+            return
+        total_ms = (time.perf_counter() - local.start) * 1000
+        slow = self.slow_query_ms > 0 and total_ms >= self.slow_query_ms
+        record = {
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "operation": local.operation,
+            "query": local.query,
+            "total_ms": round(total_ms, 3),
+            "phases": {name: round(seconds * 1000, 3) for name, seconds in local.phases.items()},
+            "slow": slow,
+        }
+        statements = local.statements
+        local.operation = None
+        if not (self.log_all or slow):
+            return
+        if slow:
+            record["query_plans"] = self.explain(db_path, statements)
+        self.write(record)
+
+    def explain(self, db_path, statements):
+        """Runs EXPLAIN QUERY PLAN for the statements on a separate connection."""
+        plans = []
+        conn = None
+        try:
+            conn = open_database(db_path)
+            attach_index(conn, db_path)
+            for sql, params in statements:
+                rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                plans.append({"sql": ' '.join(sql.split()), "plan": [row[3] for row in rows]})
+        except sqlite3.Error as e:
+            plans.append({"error": str(e)})
+        finally:
+            if conn:
+                conn.close()
+        return plans
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._write_lock:
+            if self.log_path:
+                try:
+                    with open(self.log_path, 'a', encoding='utf-8') as f:
+                        f.write(line + "\n")
+                    return
+                except IOError as e:
+                    print(f"WARNING: Could not write profile log '{self.log_path}': {e}", file=sys.stderr)
+            print(f"PROFILE: {line}", file=sys.stderr)
+
+query_profiler = None # QueryProfiler while profiling/slow-query logging is enabled, else None
+
+def configure_profiler(force=False):
+    """Enables the profiler if the config (or force, e.g. --profile) asks for it."""
+    global query_profiler
+    if force or current_profile or current_slow_query_ms > 0:
+        query_profiler = QueryProfiler(current_profile_log, current_slow_query_ms, log_all=force or current_profile)
+    else:
+        query_profiler = None
+
+
+# --- Ranking (bm25 column weights and popularity boost, both applied inside SQLite) ---
+_fts_columns = {} # Search DB path -> column names of its FTS table
+
+def get_bm25_config(conn, db_path):
+    """The per-query rank function 'bm25(w1, w2, ...)' from rank_weights, or None for the default ranking."""
+    if not current_rank_weights:
+        return None
+    search_db = resolve_search_db(db_path)
+    if search_db not in _fts_columns:
+        _fts_columns[search_db] = [info[1] for info in conn.execute(f'PRAGMA main.table_info("{FTS_TABLE}");')]
+    columns = _fts_columns[search_db]
+    if isinstance(current_rank_weights[0], tuple):
+        named = dict(current_rank_weights)
+        weights = [named.get(column, 1.0) for column in columns]
+    else:
+        weights = list(current_rank_weights[:len(columns)]) + [1.0] * (len(columns) - len(current_rank_weights))
+    return f"bm25({', '.join(repr(float(weight)) for weight in weights)})"
+
+def get_ranking(conn, db_path=None):
+    """SQL parts for a ranked search over the FTS table with the alias f:
+    (join, condition, condition parameters, rank expression). Lower rank = better, like FTS5's rank."""
+    db_path = db_path or current_db_path
+    bm25_config = get_bm25_config(conn, db_path)
+    # 'rank MATCH' overrides the rank function for this query only, FTS5 still sorts by it internally
+    condition, params = ("f.rank MATCH ?", (bm25_config,)) if bm25_config else ("1", ())
+    if current_popularity_weight > 0 and POPULARITY_SCORES_TABLE in attach_index(conn, db_path):
+        join = f'LEFT JOIN "{INDEX_SCHEMA}"."{POPULARITY_SCORES_TABLE}" AS p ON p.track_id = f.rowid'
+        rank = f"(f.rank - {float(current_popularity_weight)!r} * coalesce(p.score, 0.0))"
+    else:
+        join, rank = "", "f.rank"
+    return join, condition, params, rank
+
+_ranking_signature = None # (settings and index file stamp it was read for, signature)
+
+def get_ranking_signature():
+    """Identifies the ranking settings (and popularity index build), so cached results of other settings aren't used.
+    The index meta is only read again when the settings or the index file (size, mtime) change, e.g. after a rebuild."""
+    global _ranking_signature
+    index_path = get_index_path()
+    weights = format_rank_weights(current_rank_weights) if current_rank_weights else ""
+    try:
+        index_stat = os.stat(index_path)
+        index_stamp = (index_stat.st_mtime_ns, index_stat.st_size)
+    except OSError:
+        index_stamp = None
+    stamp = (weights, current_popularity_weight, index_path, index_stamp)
+    if _ranking_signature is None or _ranking_signature[0] != stamp:
+        built_at = None
+        if current_popularity_weight > 0 and index_stamp is not None:
+            try:
+                with contextlib.closing(sqlite3.connect(f'file:{index_path}?mode=ro', uri=True)) as conn:
+                    row = conn.execute(f'SELECT source, built_at FROM "{INDEX_META_TABLE}" WHERE name = ?;',
+                                       (POPULARITY_SCORES_TABLE,)).fetchone()
+                    built_at = row and f"{row[0]}@{row[1]}"
+            except sqlite3.Error:
+                pass
+        _ranking_signature = (stamp, f"{weights}|{current_popularity_weight:g}|{built_at or ''}")
+    return _ranking_signature[1]
+
+def popularity_score(copies, has_plain, has_synced):
+    """Popularity/quality of a track: songs uploaded many times are popular, synced lyrics mean a curated entry."""
+    return math.log2(copies) + 0.5 * bool(has_plain) + 1.0 * bool(has_synced)
 
 
 # --- Core Search Function ---
-def search_tracks_and_lyrics(db_path, query, max_matches_limit):
-    """Searches the DB and returns a list of dictionaries or None on error."""
-    if not db_path or not os.path.exists(db_path):
+def get_details_sql(id_count):
+    """The details join of search_tracks_and_lyrics for id_count track ids."""
+    placeholders = ', '.join('?' * id_count)
+    return f"""
+        SELECT
+            t."{TRACK_ID_COL}",
+            t."{TRACK_TITLE_COL}",
+            t."{TRACK_ARTIST_COL}",
+            l."{LYRICS_TEXT_COL}"
+        FROM "{TRACKS_TABLE}" AS t
+        LEFT JOIN "{LYRICS_TABLE}" AS l ON t."{TRACK_ID_COL}" = l."{LYRICS_FK_COL}"
+        WHERE t."{TRACK_ID_COL}" IN ({placeholders});
+    """
+
+def collapsed_matches_sql(join, rank_condition, rank, keyset="1"):
+    """Ranked FTS matches collapsed to one row per group of tracks with the same lyrics fingerprint:
+    the best-ranked track and the number of other matching tracks in its group (alternatives).
+    Columns rowid, score, alternatives in 'ORDER BY score, rowid'; keyset may refer to score and rowid.
+    Parameters: query, ranking parameters, keyset parameters, limit."""
+    # Every match is numbered within its group before the limit, so the counts cover all matches.
+    # Tracks without lyrics (no fingerprint) are a group of their own.
+    return f"""
+        SELECT rowid, score, alternatives FROM (
+            SELECT f.rowid AS rowid, {rank} AS score,
+                   row_number() OVER (copies ORDER BY {rank}, f.rowid) AS position,
+                   count(*) OVER copies - 1 AS alternatives
+            FROM "{FTS_TABLE}" AS f {join}
+            LEFT JOIN "{INDEX_SCHEMA}"."{FINGERPRINT_INDEX_TABLE}" AS d ON d.track_id = f.rowid
+            WHERE f."{FTS_TABLE}" MATCH ? AND {rank_condition}
+            WINDOW copies AS (PARTITION BY d.fingerprint, CASE WHEN d.fingerprint IS NULL THEN f.rowid END)
+        )
+        WHERE position = 1 AND {keyset}
+        ORDER BY score, rowid
+        LIMIT ?
+    """
+
+def can_collapse(conn, db_path):
+    """True if the fingerprint index can be used for collapsing, otherwise warns (results aren't collapsed)."""
+    if FINGERPRINT_INDEX_TABLE in attach_index(conn, db_path):
+        return True
+    print("WARNING: Fingerprint index not built (run 'index fingerprints'), duplicates are not collapsed.", file=sys.stderr)
+    return False
+
+def search_tracks_and_lyrics(db_path, query, max_matches_limit, conn=None, collapse=False):
+    """Searches the DB and returns a list of dictionaries or None on error.
+    An already open connection can be passed in (it is then left open).
+    With collapse, copies of the same lyrics take one place: every track gets 'alternatives', the number
+    of other matching tracks with the same lyrics (needs the fingerprint index)."""
+    own_conn = conn is None
+    if own_conn and (not db_path or not os.path.exists(db_path)):
         print(f"ERROR: Database path '{db_path}' invalid or not set.", file=sys.stderr)
         return None # Signal DB path problem
 
     results = []
-    conn = None
+    profiler = query_profiler
+    owns_profile = profiler.begin('search_tracks', query) if profiler else False
     try:
         # print(f"INFO: Connecting to database: {db_path}", file=sys.stderr) # Keep quiet for lookup
-        db_uri = f'file:{db_path}?mode=ro'
-        try:
-            conn = sqlite3.connect(db_uri, uri=True)
-        except sqlite3.OperationalError:
-            # print("WARNING: Could not open in read-only mode, trying normal mode.", file=sys.stderr)
-            conn = sqlite3.connect(db_path)
-
-        conn.row_factory = sqlite3.Row
+        if own_conn:
+            conn = open_database(db_path)
+        if profiler:
+            profiler.phase('connect')
         cursor = conn.cursor()
         # print(f"INFO: Searching for top {max_matches_limit} tracks matching: '{query}'...", file=sys.stderr)
 
-        fts_sql = f"""
-            SELECT rowid
-            FROM "{FTS_TABLE}"
-            WHERE "{FTS_TABLE}" MATCH ?
-            ORDER BY rank
-            LIMIT ?;
-        """
         try:
-            cursor.execute(fts_sql, (query, max_matches_limit))
-            top_track_ids = [row['rowid'] for row in cursor.fetchall()]
+            join, condition, condition_params, rank = get_ranking(conn, db_path)
+            if collapse and can_collapse(conn, db_path):
+                fts_sql = collapsed_matches_sql(join, condition, rank)
+            else:
+                collapse = False
+                fts_sql = f"""
+                    SELECT f.rowid AS rowid
+                    FROM "{FTS_TABLE}" AS f {join}
+                    WHERE f."{FTS_TABLE}" MATCH ? AND {condition}
+                    ORDER BY {rank}
+                    LIMIT ?;
+                """
+            fts_params = (query, *condition_params, max_matches_limit)
+            cursor.execute(fts_sql, fts_params)
+            fts_rows = cursor.fetchall()
+            top_track_ids = [row['rowid'] for row in fts_rows]
+            if profiler:
+                profiler.statement(fts_sql, fts_params)
+                profiler.phase('fts_match')
         except sqlite3.OperationalError as e:
              print(f"ERROR executing FTS search on table '{FTS_TABLE}': {e}", file=sys.stderr)
              return None # Signal FTS error
@@ -315,17 +988,7 @@ def search_tracks_and_lyrics(db_path, query, max_matches_limit):
         # print(f"INFO: Found {len(top_track_ids)} relevant track IDs: {top_track_ids}", file=sys.stderr)
         # print(f"INFO: Fetching details and lyrics for these tracks...", file=sys.stderr)
 
-        placeholders = ', '.join('?' * len(top_track_ids))
-        details_sql = f"""
-            SELECT
-                t."{TRACK_ID_COL}",
-                t."{TRACK_TITLE_COL}",
-                t."{TRACK_ARTIST_COL}",
-                l."{LYRICS_TEXT_COL}"
-            FROM "{TRACKS_TABLE}" AS t
-            LEFT JOIN "{LYRICS_TABLE}" AS l ON t."{TRACK_ID_COL}" = l."{LYRICS_FK_COL}"
-            WHERE t."{TRACK_ID_COL}" IN ({placeholders});
-        """
+        details_sql = get_details_sql(len(top_track_ids))
         try:
             cursor.execute(details_sql, top_track_ids)
             fetched_results = cursor.fetchall()
@@ -336,6 +999,12 @@ def search_tracks_and_lyrics(db_path, query, max_matches_limit):
                  else: # Should not happen with LEFT JOIN unless ID was wrong
                     # print(f"WARNING: Could not find details for Track ID {track_id} although it was in FTS index.", file=sys.stderr)
                     results.append({TRACK_ID_COL: track_id, 'error': f'Details for ID {track_id} not found'})
+            if collapse:
+                for track, row in zip(results, fts_rows):
+                    track['alternatives'] = row['alternatives']
+            if profiler:
+                profiler.statement(details_sql, top_track_ids)
+                profiler.phase('details_join')
 
         except sqlite3.OperationalError as e:
             print(f"ERROR fetching track/lyric details: {e}", file=sys.stderr)
@@ -352,9 +1021,1657 @@ def search_tracks_and_lyrics(db_path, query, max_matches_limit):
         print(f"ERROR: An unexpected error occurred: {e}", file=sys.stderr)
         return None # Signal unexpected error
     finally:
-        if conn:
+        if own_conn and conn:
             conn.close()
             # print("INFO: Database connection closed.", file=sys.stderr)
+        if owns_profile:
+            profiler.finish(db_path)
+
+
+# --- Streaming Search (rows are yielded as they arrive, lyrics are loaded lazily) ---
+def keyset_condition(rank_expr, rowid_expr, after):
+    """WHERE condition and parameters for the rows after the cursor (rank, rowid) in 'ORDER BY rank, rowid'.
+    Unlike OFFSET, skipped pages are never produced again, so every page costs the same."""
+    if after is None:
+        return "1", ()
+    rank, rowid = after
+    if rank is None: # Unranked (scan) order
+        return f"{rowid_expr} > ?", (rowid,)
+    return f"({rank_expr} > ? OR ({rank_expr} = ? AND {rowid_expr} > ?))", (rank, rank, rowid)
+
+def iter_search_tracks(conn, query, max_matches_limit, after=None, collapse=False):
+    """Yields the tracks matching query in rank order, without lyrics (see fetch_track_lyrics).
+    Each track has a 'cursor'; pass the last one as after to get the next page.
+    With collapse, one track per group of identical lyrics is yielded, with 'alternatives' (see search_tracks_and_lyrics)."""
+    join, rank_condition, rank_params, rank = get_ranking(conn)
+    if collapse and can_collapse(conn, current_db_path):
+        condition, condition_params = keyset_condition("score", "rowid", after)
+        matches_sql = collapsed_matches_sql(join, rank_condition, rank, condition)
+    else:
+        collapse = False
+        condition, condition_params = keyset_condition(rank, "f.rowid", after)
+        matches_sql = f"""
+            SELECT f.rowid AS rowid, {rank} AS score
+            FROM "{FTS_TABLE}" AS f {join}
+            WHERE f."{FTS_TABLE}" MATCH ? AND {rank_condition} AND {condition}
+            ORDER BY score, f.rowid
+            LIMIT ?
+        """
+    sql = f"""
+        SELECT s.rowid AS track_id,
+               s.score AS rank,
+               {'s.alternatives' if collapse else 'NULL'} AS alternatives,
+               t."{TRACK_TITLE_COL}" AS title,
+               t."{TRACK_ARTIST_COL}" AS artist,
+               t."{TRACK_ID_COL}" IS NULL AS missing
+        FROM ({matches_sql}) AS s
+        LEFT JOIN "{TRACKS_TABLE}" AS t ON t."{TRACK_ID_COL}" = s.rowid
+        ORDER BY s.score, s.rowid;
+    """
+    params = (query, *rank_params, *condition_params, max_matches_limit)
+    if query_profiler:
+        query_profiler.statement(sql, params)
+    for row in conn.execute(sql, params):
+        cursor = (row['rank'], row['track_id'])
+        if row['missing']:
+            track = {TRACK_ID_COL: row['track_id'], 'error': f"Details for ID {row['track_id']} not found", 'cursor': cursor}
+        else:
+            track = {TRACK_ID_COL: row['track_id'], TRACK_TITLE_COL: row['title'], TRACK_ARTIST_COL: row['artist'],
+                     'cursor': cursor}
+        if collapse:
+            track['alternatives'] = row['alternatives']
+        yield track
+
+def fetch_track_lyrics(conn, track_id):
+    """Returns the lyrics of a track (the newest lyrics row, like the details join) or None."""
+    row = conn.execute(f"""
+        SELECT "{LYRICS_TEXT_COL}" FROM "{LYRICS_TABLE}"
+        WHERE "{LYRICS_FK_COL}" = ?
+        ORDER BY "{LYRICS_ID_COL}" DESC
+        LIMIT 1;
+    """, (track_id,)).fetchone()
+    return row[0] if row else None
+
+def fetch_track_details(conn, track_id):
+    """Returns a track with its lyrics as dictionary like search_tracks_and_lyrics (with 'error' if it's missing)."""
+    row = conn.execute(f"""
+        SELECT "{TRACK_ID_COL}", "{TRACK_TITLE_COL}", "{TRACK_ARTIST_COL}" FROM "{TRACKS_TABLE}"
+        WHERE "{TRACK_ID_COL}" = ?;
+    """, (track_id,)).fetchone()
+    if row is None:
+        return {TRACK_ID_COL: track_id, 'error': f'Details for ID {track_id} not found'}
+    track = dict(row)
+    track[LYRICS_TEXT_COL] = fetch_track_lyrics(conn, track_id)
+    return track
+
+def iter_search_lyrics(conn, query, max_matches_limit, use_index, after=None):
+    """Yields the tracks whose lyrics contain query, without the lyrics text (see fetch_lyrics_text).
+    With use_index the sidecar trigram index is used (ranked), otherwise all lyrics are scanned (in id order).
+    Each track has a 'cursor'; pass the last one as after to get the next page."""
+    if use_index:
+        condition, condition_params = keyset_condition("f.rank", "f.rowid", after)
+        sql = f"""
+            SELECT t."{TRACK_ID_COL}" AS track_id,
+                   t."{TRACK_TITLE_COL}" AS title,
+                   t."{TRACK_ARTIST_COL}" AS artist,
+                   x."{LYRICS_ID_COL}" AS lyrics_id,
+                   f.rank AS rank
+            FROM "{INDEX_SCHEMA}"."{LYRICS_INDEX_FTS_TABLE}" f
+            JOIN "{INDEX_SCHEMA}"."{LYRICS_INDEX_TEXT_TABLE}" x ON x."{LYRICS_ID_COL}" = f.rowid
+            JOIN "{TRACKS_TABLE}" t ON t."{TRACK_ID_COL}" = x."{LYRICS_FK_COL}"
+            WHERE f."{LYRICS_INDEX_FTS_TABLE}" MATCH ? AND {condition}
+            ORDER BY f.rank, f.rowid
+            LIMIT ?;
+        """
+        params = (fts_phrase(query), *condition_params, max_matches_limit)
+    else:
+        condition, condition_params = keyset_condition(None, f'l."{LYRICS_ID_COL}"', after)
+        sql = f"""
+            SELECT t."{TRACK_ID_COL}" AS track_id,
+                   t."{TRACK_TITLE_COL}" AS title,
+                   t."{TRACK_ARTIST_COL}" AS artist,
+                   l."{LYRICS_ID_COL}" AS lyrics_id,
+                   NULL AS rank
+            FROM "{TRACKS_TABLE}" t
+            JOIN "{LYRICS_TABLE}" l ON t."{TRACK_ID_COL}" = l."{LYRICS_FK_COL}"
+            WHERE l."{LYRICS_TEXT_COL}" LIKE ? AND {condition}
+            ORDER BY l."{LYRICS_ID_COL}"
+            LIMIT ?;
+        """
+        params = (f"%{query}%", *condition_params, max_matches_limit)
+    if query_profiler:
+        query_profiler.statement(sql, params)
+    for row in conn.execute(sql, params):
+        yield {
+            TRACK_ID_COL: row['track_id'],
+            TRACK_TITLE_COL: row['title'],
+            TRACK_ARTIST_COL: row['artist'],
+            'lyrics_id': row['lyrics_id'],
+            'from_index': use_index,
+            'cursor': (row['rank'], row['lyrics_id']),
+        }
+
+def fetch_lyrics_text(conn, track):
+    """Loads the lyrics text of a track yielded by iter_search_lyrics."""
+    if track['from_index']:
+        table = f'"{INDEX_SCHEMA}"."{LYRICS_INDEX_TEXT_TABLE}"'
+    else:
+        table = f'"{LYRICS_TABLE}"'
+    row = conn.execute(f'SELECT "{LYRICS_TEXT_COL}" FROM {table} WHERE "{LYRICS_ID_COL}" = ?;', (track['lyrics_id'],)).fetchone()
+    return row[0] if row else None
+
+class KeysetPage:
+    """One page of a search: yields at most page_size rows of a query run with page_size + 1,
+    so has_more is known without another query. cursor is the one of the last yielded row."""
+
+    def __init__(self, rows, page_size):
+        self.rows = rows
+        self.page_size = page_size
+        self.cursor = None
+        self.has_more = False
+
+    def __iter__(self):
+        for count, row in enumerate(self.rows):
+            if count == self.page_size:
+                self.has_more = True
+                break
+            self.cursor = row['cursor']
+            yield row
+
+def encode_page_token(mode, query, cursor):
+    """Opaque token for the page after cursor (contains everything needed to continue)."""
+    data = json.dumps([mode, query, cursor[0], cursor[1]], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_page_token(token):
+    """Returns (mode, query, cursor) of a page token. Raises ValueError for invalid tokens."""
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        mode, query, rank, rowid = json.loads(data.decode('utf-8'))
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError("Invalid page token")
+    if not isinstance(query, str) or not isinstance(rowid, int) or not (rank is None or isinstance(rank, (int, float))):
+        raise ValueError("Invalid page token")
+    return mode, query, (rank, rowid)
+
+def ask_next_page(page):
+    """Asks whether to show the next page (only if there is one)."""
+    if not page.has_more:
+        return False
+    return input("\nn = next page, Enter = back to menu: ").strip().lower() == 'n'
+
+def search_tracks_and_display(db_path, query, max_matches_limit):
+    """Searches by title/artist and prints the tracks while they arrive (lyrics loaded per track)."""
+    if not db_path or not os.path.exists(db_path):
+        print(f"ERROR: Database path '{db_path}' invalid or not set.", file=sys.stderr)
+        return
+    profiler = query_profiler
+    owns_profile = profiler.begin('search_tracks_display', query) if profiler else False
+    conn = open_database(db_path)
+    if profiler:
+        profiler.phase('connect')
+    try:
+        page = KeysetPage(iter_search_tracks(conn, query, max_matches_limit + 1), max_matches_limit)
+        track_count = display_results(page,
+                                      load_lyrics=lambda track: fetch_track_lyrics(conn, track[TRACK_ID_COL]),
+                                      max_matches=max_matches_limit)
+        if profiler:
+            profiler.phase('search_and_display')
+        shown = track_count
+        while ask_next_page(page):
+            page = KeysetPage(iter_search_tracks(conn, query, max_matches_limit + 1, after=page.cursor), max_matches_limit)
+            shown += display_results(page, load_lyrics=lambda track: fetch_track_lyrics(conn, track[TRACK_ID_COL]),
+                                     max_matches=max_matches_limit, first_number=shown + 1)
+        if track_count == 0 and FUZZY_INDEX_FTS_TABLE in attach_index(conn, db_path):
+            # Probably a typo: show the most similar titles instead
+            similar_tracks = fuzzy_search(db_path, query, max_matches_limit, conn=conn)
+            if similar_tracks:
+                print("\nDid you mean:")
+                display_results(similar_tracks, max_matches=max_matches_limit)
+    except sqlite3.Error as e:
+        print(f"ERROR executing FTS search on table '{FTS_TABLE}': {e}", file=sys.stderr)
+        print("\nAn error occurred during the search. Details above.")
+    finally:
+        conn.close()
+        if owns_profile:
+            profiler.finish(db_path)
+
+
+# --- Fuzzy Search (typo-tolerant, needs the fuzzy index) ---
+def fold_text(text):
+    """Folds case, diacritics and punctuation: 'Beyoncé - Halo!' -> 'beyonce halo'."""
+    if text is None:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text)
+    without_marks = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[\W_]+', ' ', without_marks.casefold()).split())
+
+def lyrics_fingerprint(text):
+    """Content fingerprint of a lyrics text, equal for copies that only differ in case, accents,
+    punctuation or line breaks. A signed 64-bit integer (an SQLite INTEGER), None for empty lyrics."""
+    folded = fold_text(text)
+    if not folded:
+        return None
+    import hashlib
+    return int.from_bytes(hashlib.blake2b(folded.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+def text_crc32(text):
+    """CRC-32 of the raw text, a cheap change check (an edit keeping the length still changes it)."""
+    return None if text is None else zlib.crc32(text.encode('utf-8'))
+
+def query_trigrams(folded_query):
+    """The distinct character trigrams of a folded query (as the trigram tokenizer splits the text)."""
+    grams = {folded_query[i:i + 3] for i in range(len(folded_query) - 2)}
+    return [gram for gram in grams if gram.strip()]
+
+def similarity(query_grams, title, artist):
+    """0..1 similarity (Dice coefficient of the trigram sets) of the query to a track;
+    the query may be 'title', 'title artist' or 'artist title'."""
+    best = 0.0
+    for candidate in (title, f"{title} {artist}", f"{artist} {title}"):
+        grams = set(query_trigrams(candidate))
+        if grams:
+            best = max(best, 2 * len(query_grams & grams) / (len(query_grams) + len(grams)))
+    return best
+
+def fuzzy_search(db_path, query, max_matches_limit, conn=None):
+    """Typo-tolerant title/artist search. Returns a list of dictionaries like search_tracks_and_lyrics
+    (plus 'similarity'), or None on error / missing fuzzy index.
+    Candidates come from the rarest query trigrams via the index, only those are compared to the query."""
+    own_conn = conn is None
+    if own_conn and (not db_path or not os.path.exists(db_path)):
+        print(f"ERROR: Database path '{db_path}' invalid or not set.", file=sys.stderr)
+        return None
+
+    profiler = query_profiler
+    owns_profile = profiler.begin('fuzzy_search', query) if profiler else False
+    try:
+        if own_conn:
+            conn = open_database(db_path)
+        if FUZZY_INDEX_FTS_TABLE not in attach_index(conn, db_path):
+            print("ERROR: Fuzzy index not built for this database (run the 'index fuzzy' argument).", file=sys.stderr)
+            return None
+        if profiler:
+            profiler.phase('connect')
+
+        folded_query = fold_text(query)
+        grams = query_trigrams(folded_query)
+        if not grams:
+            return [] # Less than 3 characters
+        placeholders = ', '.join('?' * len(grams))
+        grams_table = FUZZY_INDEX_GRAMS_TABLE
+        if not conn.execute(f'SELECT 1 FROM "{INDEX_SCHEMA}".sqlite_master WHERE name = ?;', (grams_table,)).fetchone():
+            grams_table = FUZZY_INDEX_VOCAB_TABLE # Index built by an older version (slower, counts on every query)
+        gram_counts = conn.execute(f"""
+            SELECT term FROM "{INDEX_SCHEMA}"."{grams_table}"
+            WHERE term IN ({placeholders})
+            ORDER BY doc
+            LIMIT ?;
+        """, (*grams, FUZZY_MAX_GRAMS)).fetchall()
+        if not gram_counts:
+            return []
+        # Only the posting lists of the rare trigrams are read: candidates are counted by shared trigrams,
+        # nothing is ranked by bm25 (that would score every track containing any of the trigrams)
+        gram_matches = ' UNION ALL '.join(
+            f'SELECT rowid FROM "{INDEX_SCHEMA}"."{FUZZY_INDEX_FTS_TABLE}" WHERE "{FUZZY_INDEX_FTS_TABLE}" MATCH ?'
+            for _ in gram_counts)
+        candidate_sql = f"""
+            SELECT x."{TRACK_ID_COL}" AS track_id, x.title, x.artist
+            FROM (
+                SELECT rowid, count(*) AS shared FROM ({gram_matches})
+                GROUP BY rowid
+                ORDER BY shared DESC, rowid
+                LIMIT ?
+            ) AS c
+            JOIN "{INDEX_SCHEMA}"."{FUZZY_INDEX_TEXT_TABLE}" x ON x."{TRACK_ID_COL}" = c.rowid
+            ORDER BY c.shared DESC, c.rowid;
+        """
+        candidate_params = (*(fts_phrase(row[0]) for row in gram_counts), FUZZY_CANDIDATES)
+        candidates = conn.execute(candidate_sql, candidate_params).fetchall()
+        if profiler:
+            profiler.statement(candidate_sql, candidate_params)
+            profiler.phase('fuzzy_candidates')
+
+        query_grams = set(grams)
+        scored = sorted(
+            ((similarity(query_grams, row['title'], row['artist']), row['track_id']) for row in candidates),
+            key=lambda item: -item[0] # Stable: equal similarity keeps the shared-trigram order
+        )[:max_matches_limit]
+        if profiler:
+            profiler.phase('similarity')
+
+        results = []
+        for score, track_id in scored:
+            track = fetch_track_details(conn, track_id)
+            if 'error' not in track:
+                track['similarity'] = round(score, 3)
+            results.append(track)
+        if profiler:
+            profiler.phase('details')
+        return results
+    except sqlite3.Error as e:
+        print(f"ERROR: SQLite error during fuzzy search: {e}", file=sys.stderr)
+        return None
+    finally:
+        if own_conn and conn:
+            conn.close()
+        if owns_profile:
+            profiler.finish(db_path)
+
+
+# --- Exact Title/Artist Lookup (needs the exact index, FTS is the fallback) ---
+def exact_lookup(db_path, title, artist, max_matches_limit, conn=None):
+    """Finds the tracks whose folded title (and artist, if given) equal the folded arguments.
+    Tracks with lyrics come first. Returns a list of dictionaries like search_tracks_and_lyrics,
+    or None if the exact index isn't built for db_path (or on error)."""
+    own_conn = conn is None
+    if own_conn and (not db_path or not os.path.exists(db_path)):
+        print(f"ERROR: Database path '{db_path}' invalid or not set.", file=sys.stderr)
+        return None
+
+    profiler = query_profiler
+    owns_profile = profiler.begin('exact_lookup', f"{title} / {artist}") if profiler else False
+    try:
+        if own_conn:
+            conn = open_database(db_path)
+        if EXACT_INDEX_KEYS_TABLE not in attach_index(conn, db_path):
+            return None
+        if profiler:
+            profiler.phase('connect')
+        if not fold_text(title):
+            return []
+
+        sql = f"""
+            SELECT track_id FROM "{INDEX_SCHEMA}"."{EXACT_INDEX_KEYS_TABLE}"
+            WHERE title = ?{' AND artist = ?' if artist else ''}
+            ORDER BY missing_lyrics, track_id
+            LIMIT ?;
+        """
+        params = (fold_text(title),) + ((fold_text(artist),) if artist else ()) + (max_matches_limit,)
+        track_ids = [row[0] for row in conn.execute(sql, params)]
+        if profiler:
+            profiler.statement(sql, params)
+            profiler.phase('key_lookup')
+        results = [fetch_track_details(conn, track_id) for track_id in track_ids]
+        if profiler:
+            profiler.phase('details')
+        return results
+    except sqlite3.Error as e:
+        print(f"ERROR: SQLite error during exact lookup: {e}", file=sys.stderr)
+        return None
+    finally:
+        if own_conn and conn:
+            conn.close()
+        if owns_profile:
+            profiler.finish(db_path)
+
+def search_tracks_page(db_path, query, page_size, after=None, conn=None, collapse=False):
+    """One page of title/artist results (with lyrics) after the cursor. Returns (tracks, next_cursor);
+    next_cursor is None on the last page, tracks is None on error."""
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = open_database(db_path)
+        page = KeysetPage(iter_search_tracks(conn, query, page_size + 1, after, collapse), page_size)
+        tracks = []
+        for track in page:
+            if 'error' not in track:
+                track[LYRICS_TEXT_COL] = fetch_track_lyrics(conn, track[TRACK_ID_COL])
+            tracks.append(track)
+        return tracks, (page.cursor if page.has_more else None)
+    except sqlite3.Error as e:
+        print(f"ERROR executing FTS search on table '{FTS_TABLE}': {e}", file=sys.stderr)
+        return None, None
+    finally:
+        if own_conn and conn:
+            conn.close()
+
+def title_artist_query(title, artist):
+    """FTS query for a title/artist pair (fallback when there is no exact hit)."""
+    words = f"{title or ''} {artist or ''}".split()
+    # Quote every word, so characters like '/' or '-' from file tags are no FTS syntax errors
+    return ' '.join(fts_phrase(word) for word in words)
+
+
+# --- Synced Lyrics (LRC) ---
+LRC_TAG_PATTERN = re.compile(r'\[(\d+):(\d{1,2}(?:[.:]\d{1,3})?)\]')
+LRC_OFFSET_PATTERN = re.compile(r'^\[offset:\s*([+-]?\d+)\s*\]', re.IGNORECASE)
+
+class SyncedLyrics:
+    """Parsed LRC lyrics: line start times (ms) and line offsets into one text, kept in arrays.
+    line_at() and lines_between() use binary search over the start times."""
+    __slots__ = ('times', 'offsets', 'text')
+
+    def __init__(self, times, offsets, text):
+        self.times = times # array('q'), sorted start times in milliseconds
+        self.offsets = offsets # array('q'), start of line i in text; offsets[-1] = end of text
+        self.text = text
+
+    def __len__(self):
+        return len(self.times)
+
+    def line(self, i):
+        """Returns line i as (start time in seconds, text)."""
+        return self.times[i] / 1000, self.text[self.offsets[i]:self.offsets[i + 1]].rstrip('\n')
+
+    def line_at(self, t):
+        """Returns the line sung at t seconds as (start time, text), or None before the first line."""
+        i = bisect.bisect_right(self.times, round(t * 1000)) - 1
+        return self.line(i) if i >= 0 else None
+
+    def lines_between(self, t1, t2):
+        """Returns the lines shown from t1 to t2 seconds: the line active at t1 and all lines starting before t2.
+        t2 None (or infinite) means up to the end."""
+        first = max(bisect.bisect_right(self.times, round(t1 * 1000)) - 1, 0) if math.isfinite(t1) else 0
+        if t2 is None or math.isinf(t2):
+            last = len(self.times)
+        else:
+            last = bisect.bisect_left(self.times, round(t2 * 1000))
+        return [self.line(i) for i in range(first, last)]
+
+    def to_json(self, t1=None, t2=None):
+        """The lines as [[seconds, text], ...] (optionally only those between t1 and t2)."""
+        if t1 is None:
+            lines = (self.line(i) for i in range(len(self)))
+        else:
+            lines = self.lines_between(t1, t2)
+        return [[start, text] for start, text in lines]
+
+@functools.lru_cache(maxsize=SYNCED_CACHE_ENTRIES)
+def parse_lrc(lrc_text):
+    """Parses LRC text into SyncedLyrics (cached, the same text is parsed only once).
+    Lines with several time tags are repeated, metadata tags are skipped, [offset:ms] is applied."""
+    offset_ms = 0
+    timed_lines = []
+    for raw_line in lrc_text.splitlines():
+        raw_line = raw_line.strip()
+        offset_match = LRC_OFFSET_PATTERN.match(raw_line)
+        if offset_match:
+            offset_ms = int(offset_match.group(1))
+            continue
+        position = 0
+        stamps = []
+        while True:
+            tag = LRC_TAG_PATTERN.match(raw_line, position)
+            if not tag:
+                break
+            seconds = float(tag.group(2).replace(':', '.'))
+            stamps.append(round((int(tag.group(1)) * 60 + seconds) * 1000))
+            position = tag.end()
+        text = raw_line[position:].strip()
+        timed_lines.extend((stamp, text) for stamp in stamps)
+
+    timed_lines.sort(key=lambda item: item[0]) # Stable: repeated lines keep their order
+    times = array.array('q')
+    offsets = array.array('q')
+    parts = []
+    length = 0
+    for stamp, text in timed_lines:
+        # A positive offset makes the lyrics appear earlier
+        times.append(max(stamp - offset_ms, 0))
+        offsets.append(length)
+        parts.append(text + '\n')
+        length += len(text) + 1
+    offsets.append(length)
+    return SyncedLyrics(times, offsets, ''.join(parts))
+
+def fetch_synced_lyrics(conn, track_id):
+    """Returns the parsed synced lyrics of a track (from the same lyrics row as the plain lyrics) or None."""
+    try:
+        row = conn.execute(f"""
+            SELECT "{LYRICS_SYNCED_COL}" FROM "{LYRICS_TABLE}"
+            WHERE "{LYRICS_FK_COL}" = ?
+            ORDER BY "{LYRICS_ID_COL}" DESC
+            LIMIT 1;
+        """, (track_id,)).fetchone()
+    except sqlite3.OperationalError:
+        return None # Dump without synced lyrics
+    if row is None or not row[0]:
+        return None
+    synced = parse_lrc(row[0])
+    return synced if len(synced) else None
+
+
+# --- Result Cache ---
+FTS_OPERATORS = ('AND', 'OR', 'NOT')
+
+def normalize_query(query):
+    """Normalizes a search query for use as cache key (whitespace, case; FTS operators are kept)."""
+    return ' '.join(
+        word if word in FTS_OPERATORS or word.startswith('NEAR(') else word.lower()
+        for word in query.split()
+    )
+
+class ResultCache:
+    """Bounded LRU cache of search results, keyed on the normalized query, max_matches and collapse.
+    With a file, entries are also kept in a small SQLite DB and shared by all lookup processes.
+    Everything is dropped automatically when the dump changes (path, size or mtime)."""
+
+    def __init__(self, source_fingerprint, max_entries, max_bytes, file_path=None):
+        self.source_fingerprint = source_fingerprint
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._saved = {"hits": 0, "misses": 0} # Already added to the totals in the cache file
+        self._entries = collections.OrderedDict() # key -> (found_tracks, size), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock() # Shared by the server threads
+        self._file_conn = None
+        if file_path:
+            self._open_file(file_path)
+
+    def _open_file(self, file_path):
+        try:
+            cache_dir = os.path.dirname(file_path)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            conn = sqlite3.connect(file_path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL;")
+            conn.execute("PRAGMA synchronous = OFF;") # It's only a cache
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (key TEXT PRIMARY KEY, value TEXT);")
+            if 'collapse' not in {row[1] for row in conn.execute("PRAGMA table_info(cache_entries);")}:
+                conn.execute("DROP TABLE IF EXISTS cache_entries;") # Older layout (or new file), it's only a cache
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    query TEXT,
+                    max_matches INTEGER,
+                    collapse INTEGER,
+                    result TEXT,
+                    size INTEGER,
+                    last_used REAL,
+                    PRIMARY KEY (query, max_matches, collapse)
+                );
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_entries_last_used ON cache_entries (last_used);")
+            row = conn.execute("SELECT value FROM cache_meta WHERE key = 'source';").fetchone()
+            if row is None or row[0] != self.source_fingerprint:
+                # New or different dump -> the cached results are no longer valid
+                conn.execute("DELETE FROM cache_entries;")
+                conn.execute("DELETE FROM cache_meta;")
+                conn.execute("INSERT INTO cache_meta VALUES ('source', ?);", (self.source_fingerprint,))
+            self._file_conn = conn
+        except sqlite3.Error as e:
+            print(f"WARNING: Could not use result cache file '{file_path}': {e}", file=sys.stderr)
+
+    def get(self, query, max_matches, collapse=False):
+        """Returns the cached result or None."""
+        key = (normalize_query(query), max_matches, int(bool(collapse)))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if self._file_conn is not None:
+                try:
+                    row = self._file_conn.execute(
+                        "SELECT result FROM cache_entries WHERE query = ? AND max_matches = ? AND collapse = ?;", key
+                    ).fetchone()
+                    if row is not None:
+                        self._file_conn.execute(
+                            "UPDATE cache_entries SET last_used = ? WHERE query = ? AND max_matches = ? AND collapse = ?;",
+                            (time.time(), *key)
+                        )
+                        found_tracks = json.loads(row[0])
+                        self._remember(key, found_tracks, len(row[0]))
+                        self.hits += 1
+                        return found_tracks
+                except sqlite3.Error as e:
+                    print(f"WARNING: Result cache file error: {e}", file=sys.stderr)
+            self.misses += 1
+            return None
+
+    def put(self, query, max_matches, found_tracks, collapse=False):
+        """Stores a (successful) search result."""
+        key = (normalize_query(query), max_matches, int(bool(collapse)))
+        serialized = json.dumps(found_tracks, ensure_ascii=False, separators=(',', ':'))
+        if len(serialized) > self.max_bytes:
+            return # Would evict everything else
+        with self._lock:
+            self._remember(key, found_tracks, len(serialized))
+            if self._file_conn is not None:
+                try:
+                    self._file_conn.execute(
+                        "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?);",
+                        (*key, serialized, len(serialized), time.time())
+                    )
+                    self._trim_file()
+                except sqlite3.Error as e:
+                    print(f"WARNING: Result cache file error: {e}", file=sys.stderr)
+
+    def _remember(self, key, found_tracks, size):
+        """Adds an entry to the in-memory LRU and evicts the least recently used ones over the limits."""
+        old_entry = self._entries.pop(key, None)
+        if old_entry is not None:
+            self._bytes -= old_entry[1]
+        self._entries[key] = (found_tracks, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _trim_file(self):
+        """Applies the same limits to the cache file (least recently used rows go first)."""
+        count, total_size = self._file_conn.execute("SELECT count(*), coalesce(sum(size), 0) FROM cache_entries;").fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+        excess = max(count - self.max_entries, 1)
+        self._file_conn.execute("""
+            DELETE FROM cache_entries WHERE rowid IN (
+                SELECT rowid FROM cache_entries ORDER BY last_used LIMIT ?
+            );
+        """, (max(excess, count // 10),)) # Trim in steps, not on every insert
+
+    def stats(self):
+        """Returns the hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+            if self._file_conn is not None:
+                try:
+                    count, total_size = self._file_conn.execute(
+                        "SELECT count(*), coalesce(sum(size), 0) FROM cache_entries;"
+                    ).fetchone()
+                    stats["file_entries"] = count
+                    stats["file_bytes"] = total_size
+                    # Counters of all processes that used the file (this one included)
+                    for counter in ("hits", "misses"):
+                        row = self._file_conn.execute("SELECT value FROM cache_meta WHERE key = ?;", (counter,)).fetchone()
+                        stats[f"total_{counter}"] = (int(row[0]) if row else 0) + getattr(self, counter) - self._saved[counter]
+                except sqlite3.Error:
+                    pass
+            return stats
+
+    def save_counters(self):
+        """Adds this process's hit/miss counts to the totals in the cache file."""
+        if self._file_conn is None:
+            return
+        with self._lock:
+            try:
+                for counter in ("hits", "misses"):
+                    delta = getattr(self, counter) - self._saved[counter]
+                    self._file_conn.execute("INSERT OR IGNORE INTO cache_meta VALUES (?, '0');", (counter,))
+                    self._file_conn.execute(
+                        "UPDATE cache_meta SET value = CAST(value AS INTEGER) + ? WHERE key = ?;", (delta, counter)
+                    )
+                    self._saved[counter] += delta
+            except sqlite3.Error as e:
+                print(f"WARNING: Result cache file error: {e}", file=sys.stderr)
+
+    def close(self):
+        if self._file_conn is not None:
+            self.save_counters()
+            self._file_conn.close()
+            self._file_conn = None
+
+_result_cache = None # Created on first use by get_result_cache()
+
+def get_result_cache_fingerprint(db_path):
+    """Cached results are valid for this dump and these ranking settings only."""
+    return f"{get_db_fingerprint(db_path)}|{get_ranking_signature()}"
+
+def get_result_cache(db_path):
+    """Returns the process-wide result cache for db_path, or None if the cache is disabled."""
+    global _result_cache
+    if current_result_cache_entries <= 0 or not db_path or not os.path.exists(db_path):
+        return None
+    fingerprint = get_result_cache_fingerprint(db_path)
+    if _result_cache is None or _result_cache.source_fingerprint != fingerprint:
+        if _result_cache is not None:
+            _result_cache.close() # The dump was replaced while running
+        _result_cache = ResultCache(fingerprint, current_result_cache_entries,
+                                    current_result_cache_bytes, current_result_cache_file)
+        atexit.register(_result_cache.close)
+    return _result_cache
+
+def cached_search(db_path, query, max_matches_limit, conn=None, collapse=False):
+    """search_tracks_and_lyrics with the result cache in front of it."""
+    cache = get_result_cache(db_path)
+    if cache is None:
+        return search_tracks_and_lyrics(db_path, query, max_matches_limit, conn=conn, collapse=collapse)
+    found_tracks = cache.get(query, max_matches_limit, collapse)
+    if query_profiler:
+        query_profiler.phase('result_cache')
+    if found_tracks is None:
+        found_tracks = search_tracks_and_lyrics(db_path, query, max_matches_limit, conn=conn, collapse=collapse)
+        # Only complete results are cached, errors are retried next time
+        if found_tracks is not None and not any('error' in track for track in found_tracks):
+            cache.put(query, max_matches_limit, found_tracks, collapse)
+    return found_tracks
+
+
+# --- Sidecar Index: Build ---
+def open_index_for_writing(db_path):
+    """Opens (creates) the sidecar index DB for writing and attaches the dump read-only as 'dump'."""
+    index_path = get_index_path()
+    index_dir = os.path.dirname(index_path)
+    if index_dir:
+        os.makedirs(index_dir, exist_ok=True)
+    conn = sqlite3.connect(index_path)
+    apply_pragmas(conn)
+    conn.execute('ATTACH DATABASE ? AS dump', (f'file:{db_path}?mode=ro',))
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{INDEX_META_TABLE}" (
+            name TEXT PRIMARY KEY,
+            source TEXT,
+            built_at TEXT,
+            rows INTEGER
+        );
+    """)
+    return conn
+
+def write_index_meta(conn, name, db_path, rows):
+    """Marks the index 'name' as built for the given dump."""
+    conn.execute(
+        f'INSERT OR REPLACE INTO "{INDEX_META_TABLE}" VALUES (?, ?, datetime(\'now\'), ?);',
+        (name, get_db_fingerprint(db_path), rows)
+    )
+
+def build_sidecar_index(db_path, name, label, build_func):
+    """Common frame of all index builds: invalidates the index 'name', runs build_func(conn)
+    (returns the number of indexed rows) and marks the index as built for db_path. Returns True on success."""
+    if not db_path or not os.path.exists(db_path):
+        print(f"ERROR: Database path '{db_path}' invalid or not set.", file=sys.stderr)
+        return False
+
+    conn = None
+    try:
+        conn = open_index_for_writing(db_path)
+        conn.create_function("fold_text", 1, fold_text, deterministic=True)
+        conn.create_function("popularity_score", 3, popularity_score, deterministic=True)
+        conn.create_function("lyrics_fingerprint", 1, lyrics_fingerprint, deterministic=True)
+        conn.create_function("text_crc32", 1, text_crc32, deterministic=True)
+        start_time = time.perf_counter()
+        print(f"INFO: Building {label} in '{get_index_path()}' (this can take a while)...", file=sys.stderr)
+
+        # Invalidate first, so a half-built index is never used
+        conn.execute(f'DELETE FROM "{INDEX_META_TABLE}" WHERE name = ?;', (name,))
+        conn.commit()
+        row_count = build_func(conn)
+        write_index_meta(conn, name, db_path, row_count)
+        conn.commit()
+
+        elapsed = time.perf_counter() - start_time
+        print(f"INFO: {label[0].upper() + label[1:]} built ({row_count} rows, {elapsed:.1f}s).", file=sys.stderr)
+        return True
+    except sqlite3.Error as e:
+        print(f"ERROR building {label}: {e}", file=sys.stderr)
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def _build_lyrics_index_tables(conn):
+    conn.execute(f'DROP TABLE IF EXISTS "{LYRICS_INDEX_FTS_TABLE}";')
+    conn.execute(f'DROP TABLE IF EXISTS "{LYRICS_INDEX_TEXT_TABLE}";')
+    conn.execute(f"""
+        CREATE TABLE "{LYRICS_INDEX_TEXT_TABLE}" (
+            "{LYRICS_ID_COL}" INTEGER PRIMARY KEY,
+            "{LYRICS_FK_COL}" INTEGER,
+            "{LYRICS_TEXT_COL}" TEXT
+        );
+    """)
+    conn.execute(f"""
+        INSERT INTO "{LYRICS_INDEX_TEXT_TABLE}"
+        SELECT "{LYRICS_ID_COL}", "{LYRICS_FK_COL}", "{LYRICS_TEXT_COL}"
+        FROM dump."{LYRICS_TABLE}"
+        WHERE "{LYRICS_TEXT_COL}" IS NOT NULL AND "{LYRICS_TEXT_COL}" != '';
+    """)
+    # External content: the FTS index stores only the trigrams, the text lives in lyrics_text
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE "{LYRICS_INDEX_FTS_TABLE}" USING fts5(
+            "{LYRICS_TEXT_COL}",
+            content='{LYRICS_INDEX_TEXT_TABLE}',
+            content_rowid='{LYRICS_ID_COL}',
+            tokenize='trigram'
+        );
+    """)
+    conn.execute(f"INSERT INTO \"{LYRICS_INDEX_FTS_TABLE}\"(\"{LYRICS_INDEX_FTS_TABLE}\") VALUES('rebuild');")
+    conn.execute(f"INSERT INTO \"{LYRICS_INDEX_FTS_TABLE}\"(\"{LYRICS_INDEX_FTS_TABLE}\") VALUES('optimize');")
+    return conn.execute(f'SELECT count(*) FROM "{LYRICS_INDEX_TEXT_TABLE}";').fetchone()[0]
+
+def build_lyrics_index(db_path):
+    """Builds the FTS5 trigram index over the plain lyrics into the sidecar DB. Returns True on success."""
+    return build_sidecar_index(db_path, LYRICS_INDEX_FTS_TABLE, "lyrics index", _build_lyrics_index_tables)
+
+def _copy_fuzzy_grams(conn):
+    # fts5vocab counts the documents by reading the whole posting list of a trigram on every query,
+    # the copy answers the per-query frequency lookup with one B-tree search per trigram
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{FUZZY_INDEX_GRAMS_TABLE}" (
+            term TEXT PRIMARY KEY,
+            doc INTEGER NOT NULL
+        ) WITHOUT ROWID;
+    """)
+    conn.execute(f'DELETE FROM "{FUZZY_INDEX_GRAMS_TABLE}";')
+    conn.execute(f'INSERT INTO "{FUZZY_INDEX_GRAMS_TABLE}" SELECT term, doc FROM "{FUZZY_INDEX_VOCAB_TABLE}";')
+
+def _build_fuzzy_index_tables(conn):
+    conn.execute(f'DROP TABLE IF EXISTS "{FUZZY_INDEX_GRAMS_TABLE}";')
+    conn.execute(f'DROP TABLE IF EXISTS "{FUZZY_INDEX_VOCAB_TABLE}";')
+    conn.execute(f'DROP TABLE IF EXISTS "{FUZZY_INDEX_FTS_TABLE}";')
+    conn.execute(f'DROP TABLE IF EXISTS "{FUZZY_INDEX_TEXT_TABLE}";')
+    conn.execute(f"""
+        CREATE TABLE "{FUZZY_INDEX_TEXT_TABLE}" (
+            "{TRACK_ID_COL}" INTEGER PRIMARY KEY,
+            title TEXT,
+            artist TEXT
+        );
+    """)
+    conn.execute(f"""
+        INSERT INTO "{FUZZY_INDEX_TEXT_TABLE}"
+        SELECT "{TRACK_ID_COL}", fold_text("{TRACK_TITLE_COL}"), fold_text("{TRACK_ARTIST_COL}")
+        FROM dump."{TRACKS_TABLE}";
+    """)
+    # Only single trigrams are queried, so no positions are needed (detail=none keeps the index small)
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE "{FUZZY_INDEX_FTS_TABLE}" USING fts5(
+            title,
+            artist,
+            content='{FUZZY_INDEX_TEXT_TABLE}',
+            content_rowid='{TRACK_ID_COL}',
+            tokenize='trigram',
+            detail='none'
+        );
+    """)
+    conn.execute(f"INSERT INTO \"{FUZZY_INDEX_FTS_TABLE}\"(\"{FUZZY_INDEX_FTS_TABLE}\") VALUES('rebuild');")
+    conn.execute(f"INSERT INTO \"{FUZZY_INDEX_FTS_TABLE}\"(\"{FUZZY_INDEX_FTS_TABLE}\") VALUES('optimize');")
+    # Document frequency per trigram, to query only the rarest (most selective) trigrams
+    conn.execute(f'CREATE VIRTUAL TABLE "{FUZZY_INDEX_VOCAB_TABLE}" USING fts5vocab("{FUZZY_INDEX_FTS_TABLE}", \'row\');')
+    _copy_fuzzy_grams(conn)
+    return conn.execute(f'SELECT count(*) FROM "{FUZZY_INDEX_TEXT_TABLE}";').fetchone()[0]
+
+def build_fuzzy_index(db_path):
+    """Builds the character-trigram index over folded titles/artists for fuzzy search. Returns True on success."""
+    return build_sidecar_index(db_path, FUZZY_INDEX_FTS_TABLE, "fuzzy title/artist index", _build_fuzzy_index_tables)
+
+def _build_exact_index_tables(conn):
+    conn.execute(f'DROP TABLE IF EXISTS "{EXACT_INDEX_KEYS_TABLE}";')
+    # Clustered by the key, so a lookup is one B-tree search (the table is its own index)
+    conn.execute(f"""
+        CREATE TABLE "{EXACT_INDEX_KEYS_TABLE}" (
+            title TEXT NOT NULL,
+            artist TEXT NOT NULL,
+            missing_lyrics INTEGER NOT NULL,
+            track_id INTEGER NOT NULL,
+            PRIMARY KEY (title, artist, missing_lyrics, track_id)
+        ) WITHOUT ROWID;
+    """)
+    conn.execute(f"""
+        INSERT INTO "{EXACT_INDEX_KEYS_TABLE}"
+        SELECT fold_text(t."{TRACK_TITLE_COL}"), fold_text(t."{TRACK_ARTIST_COL}"),
+               t."{TRACK_ID_COL}" NOT IN (
+                   SELECT "{LYRICS_FK_COL}" FROM dump."{LYRICS_TABLE}"
+                   WHERE "{LYRICS_TEXT_COL}" IS NOT NULL AND "{LYRICS_TEXT_COL}" != ''
+               ),
+               t."{TRACK_ID_COL}"
+        FROM dump."{TRACKS_TABLE}" t;
+    """)
+    return conn.execute(f'SELECT count(*) FROM "{EXACT_INDEX_KEYS_TABLE}";').fetchone()[0]
+
+def build_exact_index(db_path):
+    """Builds the folded title/artist key index for exact lookups. Returns True on success."""
+    return build_sidecar_index(db_path, EXACT_INDEX_KEYS_TABLE, "exact title/artist index", _build_exact_index_tables)
+
+def _build_popularity_index_tables(conn):
+    conn.execute(f'DROP TABLE IF EXISTS "{POPULARITY_SCORES_TABLE}";')
+    conn.execute(f"""
+        CREATE TABLE "{POPULARITY_SCORES_TABLE}" (
+            track_id INTEGER PRIMARY KEY,
+            score REAL NOT NULL
+        );
+    """)
+    # Copies = tracks with the same folded title and artist (other albums, remasters, uploads)
+    conn.execute("DROP TABLE IF EXISTS temp.popularity_songs;")
+    conn.execute(f"""
+        CREATE TEMP TABLE popularity_songs AS
+        SELECT "{TRACK_ID_COL}" AS track_id,
+               fold_text("{TRACK_TITLE_COL}") || char(31) || fold_text("{TRACK_ARTIST_COL}") AS song
+        FROM dump."{TRACKS_TABLE}";
+    """)
+    conn.execute(f"""
+        INSERT INTO "{POPULARITY_SCORES_TABLE}"
+        SELECT s.track_id, popularity_score(c.copies, l.has_plain, l.has_synced)
+        FROM temp.popularity_songs s
+        JOIN (SELECT song, count(*) AS copies FROM temp.popularity_songs GROUP BY song) c ON c.song = s.song
+        LEFT JOIN (
+            SELECT "{LYRICS_FK_COL}" AS track_id,
+                   max(coalesce("{LYRICS_TEXT_COL}", '') != '') AS has_plain,
+                   max(coalesce("{LYRICS_SYNCED_COL}", '') != '') AS has_synced
+            FROM dump."{LYRICS_TABLE}"
+            GROUP BY "{LYRICS_FK_COL}"
+        ) l ON l.track_id = s.track_id;
+    """)
+    conn.execute("DROP TABLE temp.popularity_songs;")
+    return conn.execute(f'SELECT count(*) FROM "{POPULARITY_SCORES_TABLE}";').fetchone()[0]
+
+def build_popularity_index(db_path):
+    """Builds the per-track popularity scores used to boost the ranking. Returns True on success."""
+    return build_sidecar_index(db_path, POPULARITY_SCORES_TABLE, "popularity scores", _build_popularity_index_tables)
+
+def _build_phrase_index_tables(conn):
+    conn.execute(f'DROP TABLE IF EXISTS "{PHRASE_INDEX_FTS_TABLE}";')
+    conn.execute(f'DROP TABLE IF EXISTS "{PHRASE_INDEX_TEXT_TABLE}";')
+    conn.execute(f"""
+        CREATE TABLE "{PHRASE_INDEX_TEXT_TABLE}" (
+            "{LYRICS_ID_COL}" INTEGER PRIMARY KEY,
+            "{LYRICS_FK_COL}" INTEGER,
+            "{LYRICS_TEXT_COL}" TEXT
+        );
+    """)
+    conn.execute(f"""
+        INSERT INTO "{PHRASE_INDEX_TEXT_TABLE}"
+        SELECT "{LYRICS_ID_COL}", "{LYRICS_FK_COL}", "{LYRICS_TEXT_COL}"
+        FROM dump."{LYRICS_TABLE}"
+        WHERE "{LYRICS_TEXT_COL}" IS NOT NULL AND "{LYRICS_TEXT_COL}" != '';
+    """)
+    # Words with their positions (detail=full, the default): a quoted phrase matches its words in order,
+    # bm25 ranks by word frequencies and snippet() finds the matched words for the context
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE "{PHRASE_INDEX_FTS_TABLE}" USING fts5(
+            "{LYRICS_TEXT_COL}",
+            content='{PHRASE_INDEX_TEXT_TABLE}',
+            content_rowid='{LYRICS_ID_COL}',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+    conn.execute(f"INSERT INTO \"{PHRASE_INDEX_FTS_TABLE}\"(\"{PHRASE_INDEX_FTS_TABLE}\") VALUES('rebuild');")
+    conn.execute(f"INSERT INTO \"{PHRASE_INDEX_FTS_TABLE}\"(\"{PHRASE_INDEX_FTS_TABLE}\") VALUES('optimize');")
+    return conn.execute(f'SELECT count(*) FROM "{PHRASE_INDEX_TEXT_TABLE}";').fetchone()[0]
+
+def build_phrase_index(db_path):
+    """Builds the word/position index over the plain lyrics for lookups by lyric snippet. Returns True on success."""
+    return build_sidecar_index(db_path, PHRASE_INDEX_FTS_TABLE, "phrase index", _build_phrase_index_tables)
+
+def _fingerprint_columns():
+    return {
+        'lyrics_id': f's."{LYRICS_ID_COL}"',
+        'track_id': f's."{LYRICS_FK_COL}"',
+        'text_crc32': f'text_crc32(s."{LYRICS_TEXT_COL}")',
+        'fingerprint': f'lyrics_fingerprint(s."{LYRICS_TEXT_COL}")',
+    }
+
+def _fingerprint_source_where():
+    # The newest lyrics row of a track, like fetch_track_lyrics
+    return (f'{_lyrics_source_where(LYRICS_TEXT_COL)} AND s."{LYRICS_ID_COL}" IN '
+            f'(SELECT max("{LYRICS_ID_COL}") FROM dump."{LYRICS_TABLE}" GROUP BY "{LYRICS_FK_COL}")')
+
+def _build_fingerprint_index_tables(conn):
+    conn.execute(f'DROP TABLE IF EXISTS "{FINGERPRINT_INDEX_TABLE}";')
+    # Keyed by the lyrics row, so an update only hashes new or changed lyrics (see _update_fingerprint_index).
+    # A NULL fingerprint (only punctuation) is a group of its own, like a track without lyrics.
+    conn.execute(f"""
+        CREATE TABLE "{FINGERPRINT_INDEX_TABLE}" (
+            lyrics_id INTEGER PRIMARY KEY,
+            track_id INTEGER NOT NULL UNIQUE,
+            text_crc32 INTEGER NOT NULL,
+            fingerprint INTEGER
+        );
+    """)
+    columns = _fingerprint_columns()
+    conn.execute(f"""
+        INSERT INTO "{FINGERPRINT_INDEX_TABLE}" ({', '.join(columns)})
+        SELECT {', '.join(columns.values())}
+        FROM dump."{LYRICS_TABLE}" s
+        WHERE {_fingerprint_source_where()};
+    """)
+    return conn.execute(f'SELECT count(*) FROM "{FINGERPRINT_INDEX_TABLE}";').fetchone()[0]
+
+def build_fingerprint_index(db_path):
+    """Builds the lyrics fingerprint per track used to collapse duplicate results. Returns True on success."""
+    return build_sidecar_index(db_path, FINGERPRINT_INDEX_TABLE, "lyrics fingerprints", _build_fingerprint_index_tables)
+
+# name -> (build function, description) of the indexes that 'index' can build
+SIDECAR_INDEXES = {
+    'lyrics': (build_lyrics_index, "Lyrics index (fast 'Search within Lyrics')"),
+    'fuzzy': (build_fuzzy_index, "Fuzzy title/artist index (typo-tolerant search)"),
+    'exact': (build_exact_index, "Exact title/artist index (lookup --title/--artist)"),
+    'popularity': (build_popularity_index, "Popularity scores (popular versions rank higher)"),
+    'phrases': (build_phrase_index, "Phrase index (lookup --lyrics, songs from a lyric snippet)"),
+    'fingerprints': (build_fingerprint_index, "Lyrics fingerprints (lookup --collapse, one result per song)"),
+}
+
+def main_index(args):
+    """Builds the sidecar indexes named in args (default: lyrics)."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="lyrics-search index", description="Build search indexes (the database is not modified).")
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help=f"indexes to build: {', '.join(SIDECAR_INDEXES)} or all (default: lyrics)")
+    options = parser.parse_args(args)
+    if not current_db_path:
+        print("ERROR: No database path configured. Run the interactive setup first.", file=sys.stderr)
+        sys.exit(1)
+    names = options.names or ["lyrics"]
+    unknown = [name for name in names if name not in SIDECAR_INDEXES and name != "all"]
+    if unknown:
+        parser.error(f"unknown index: {', '.join(unknown)}")
+    if "all" in names:
+        names = list(SIDECAR_INDEXES)
+    success = True
+    for name in names:
+        success = SIDECAR_INDEXES[name][0](current_db_path) and success
+    sys.exit(0 if success else 1)
+
+def run_build_index():
+    """Interactive wrapper around the index builds."""
+    clear_screen()
+    print("--- Build Search Indexes ---")
+    if not current_db_path:
+        print("ERROR: No database path configured."); print("Please run Setup (Option 3) first."); wait_for_enter(); return
+    print(f"The indexes are stored in '{get_index_path()}'.")
+    print("The database itself is not modified. Building can take a long time and needs disk space.\n")
+    names = list(SIDECAR_INDEXES)
+    for i, name in enumerate(names):
+        print(f"{i + 1}: {SIDECAR_INDEXES[name][1]}")
+    print("a: All of them")
+    answer = input("Which index should be built? (Enter = cancel): ").strip().lower()
+    if answer == 'a':
+        selected = names
+    elif answer.isdigit() and 1 <= int(answer) <= len(names):
+        selected = [names[int(answer) - 1]]
+    else:
+        print("Cancelled."); wait_for_enter(); return
+    for name in selected:
+        if SIDECAR_INDEXES[name][0](current_db_path):
+            print(f"{SIDECAR_INDEXES[name][1]}: built successfully.")
+        else:
+            print(f"{SIDECAR_INDEXES[name][1]}: could not be built. Details above.")
+    wait_for_enter()
+
+
+# --- Compact Database ---
+def hash_lyrics(text):
+    """Content hash used to store identical lyrics only once."""
+    if text is None:
+        return None
+    import hashlib
+    return hashlib.sha1(text.encode('utf-8')).digest()
+
+def deflate_lyrics(text):
+    if text is None:
+        return None
+    return zlib.compress(text.encode('utf-8'), 6)
+
+def inflate_lyrics(data):
+    """Decompresses lyrics of the compact DB (SQL function lyrics_inflate, only runs for selected rows)."""
+    if data is None:
+        return None
+    return zlib.decompress(data).decode('utf-8')
+
+def get_fts_definition(conn, schema):
+    """Reads the column names and fts5 options (tokenize, prefix) of the dump's FTS table."""
+    row = conn.execute(f'SELECT sql FROM "{schema}".sqlite_master WHERE name = ?;', (FTS_TABLE,)).fetchone()
+    if row is None:
+        raise sqlite3.OperationalError(f"FTS table '{FTS_TABLE}' not found")
+    columns = [info[1] for info in conn.execute(f'PRAGMA "{schema}".table_info("{FTS_TABLE}");')]
+    options = re.findall(r"""\b((?:tokenize|prefix)\s*=\s*(?:'[^']*'|"[^"]*"|\w+))""", row[0], re.IGNORECASE)
+    return columns, options
+
+def build_compact_db(db_path):
+    """Extracts the tables/columns the searches need into a slim DB with deduplicated, compressed lyrics.
+    Returns True on success. The dump is only read."""
+    if not db_path or not os.path.exists(db_path):
+        print(f"ERROR: Database path '{db_path}' invalid or not set.", file=sys.stderr)
+        return False
+
+    compact_path = get_compact_db_path()
+    temp_path = compact_path + ".tmp" # Replaced atomically at the end, a failed build leaves no half DB
+    compact_dir = os.path.dirname(compact_path)
+    if compact_dir:
+        os.makedirs(compact_dir, exist_ok=True)
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    conn = None
+    try:
+        start_time = time.perf_counter()
+        print(f"INFO: Building compact database '{compact_path}' (this can take a while)...", file=sys.stderr)
+        conn = sqlite3.connect(temp_path)
+        apply_pragmas(conn)
+        conn.execute("PRAGMA journal_mode = OFF;")
+        conn.execute("PRAGMA synchronous = OFF;")
+        conn.execute('ATTACH DATABASE ? AS dump', (f'file:{db_path}?mode=ro',))
+        conn.create_function("lyrics_hash", 1, hash_lyrics, deterministic=True)
+        conn.create_function("lyrics_deflate", 1, deflate_lyrics, deterministic=True)
+        fts_columns, fts_options = get_fts_definition(conn, "dump")
+
+        conn.executescript(f"""
+            CREATE TABLE "{COMPACT_META_TABLE}" (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE "{TRACKS_TABLE}" (
+                "{TRACK_ID_COL}" INTEGER PRIMARY KEY,
+                "{TRACK_TITLE_COL}" TEXT,
+                "{TRACK_ARTIST_COL}" TEXT
+            );
+            CREATE TABLE "{COMPACT_LYRICS_TEXTS_TABLE}" (
+                id INTEGER PRIMARY KEY,
+                hash BLOB UNIQUE,
+                data BLOB
+            );
+            CREATE TABLE "{COMPACT_LYRICS_ROWS_TABLE}" (
+                "{LYRICS_ID_COL}" INTEGER PRIMARY KEY,
+                "{LYRICS_FK_COL}" INTEGER,
+                text_id INTEGER,
+                synced_text_id INTEGER
+            );
+        """)
+        conn.execute(f"""
+            INSERT INTO "{TRACKS_TABLE}"
+            SELECT "{TRACK_ID_COL}", "{TRACK_TITLE_COL}", "{TRACK_ARTIST_COL}" FROM dump."{TRACKS_TABLE}";
+        """)
+        for text_col in (LYRICS_TEXT_COL, LYRICS_SYNCED_COL):
+            conn.execute(f"""
+                INSERT OR IGNORE INTO "{COMPACT_LYRICS_TEXTS_TABLE}" (hash, data)
+                SELECT lyrics_hash("{text_col}"), lyrics_deflate("{text_col}")
+                FROM dump."{LYRICS_TABLE}"
+                WHERE "{text_col}" IS NOT NULL;
+            """)
+        conn.execute(f"""
+            INSERT INTO "{COMPACT_LYRICS_ROWS_TABLE}"
+            SELECT l."{LYRICS_ID_COL}", l."{LYRICS_FK_COL}", x.id, s.id
+            FROM dump."{LYRICS_TABLE}" AS l
+            LEFT JOIN "{COMPACT_LYRICS_TEXTS_TABLE}" AS x ON x.hash = lyrics_hash(l."{LYRICS_TEXT_COL}")
+            LEFT JOIN "{COMPACT_LYRICS_TEXTS_TABLE}" AS s ON s.hash = lyrics_hash(l."{LYRICS_SYNCED_COL}");
+        """)
+        conn.execute(f'CREATE INDEX lyrics_rows_track_id ON "{COMPACT_LYRICS_ROWS_TABLE}" ("{LYRICS_FK_COL}");')
+        # A view with the dump's table/column names, so all queries run unchanged.
+        # The scalar subquery keeps the view flattenable and decompresses only the rows that are selected.
+        conn.execute(f"""
+            CREATE VIEW "{LYRICS_TABLE}" AS
+            SELECT r."{LYRICS_ID_COL}" AS "{LYRICS_ID_COL}",
+                   r."{LYRICS_FK_COL}" AS "{LYRICS_FK_COL}",
+                   (SELECT lyrics_inflate(x.data) FROM "{COMPACT_LYRICS_TEXTS_TABLE}" AS x WHERE x.id = r.text_id) AS "{LYRICS_TEXT_COL}",
+                   (SELECT lyrics_inflate(x.data) FROM "{COMPACT_LYRICS_TEXTS_TABLE}" AS x WHERE x.id = r.synced_text_id) AS "{LYRICS_SYNCED_COL}"
+            FROM "{COMPACT_LYRICS_ROWS_TABLE}" AS r;
+        """)
+
+        # Same columns and tokenizer as the dump's index, so MATCH and rank give the same results
+        column_list = ', '.join(f'"{column}"' for column in fts_columns)
+        conn.execute(f'CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5({", ".join([column_list] + fts_options)});')
+        conn.execute(f"""
+            INSERT INTO "{FTS_TABLE}" (rowid, {column_list})
+            SELECT rowid, {column_list} FROM dump."{FTS_TABLE}";
+        """)
+        conn.execute(f"INSERT INTO \"{FTS_TABLE}\"(\"{FTS_TABLE}\") VALUES('optimize');")
+        conn.execute("ANALYZE main;") # Statistics for the query planner (the dump is read-only)
+
+        conn.executemany(f'INSERT INTO "{COMPACT_META_TABLE}" VALUES (?, ?);', [
+            ('source', get_db_fingerprint(db_path)),
+            ('format', COMPACT_FORMAT_VERSION),
+            ('built_at', time.strftime('%Y-%m-%d %H:%M:%S')),
+        ])
+        conn.commit()
+        lyrics_rows, lyrics_texts = conn.execute(f"""
+            SELECT (SELECT count(*) FROM "{COMPACT_LYRICS_ROWS_TABLE}"), (SELECT count(*) FROM "{COMPACT_LYRICS_TEXTS_TABLE}");
+        """).fetchone()
+        conn.close()
+        conn = None
+        os.replace(temp_path, compact_path)
+        _compact_db_checked.clear()
+
+        elapsed = time.perf_counter() - start_time
+        dump_size = os.path.getsize(db_path) / 1024 / 1024
+        compact_size = os.path.getsize(compact_path) / 1024 / 1024
+        print(f"INFO: Compact database built in {elapsed:.1f}s: {dump_size:.1f} MiB -> {compact_size:.1f} MiB, "
+              f"{lyrics_rows} lyrics stored as {lyrics_texts} unique texts.", file=sys.stderr)
+        print("INFO: Searches now use the compact database automatically.", file=sys.stderr)
+        return True
+    except (sqlite3.Error, OSError) as e:
+        print(f"ERROR building compact database: {e}", file=sys.stderr)
+        return False
+    finally:
+        if conn:
+            conn.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+# --- Incremental Update (after a newer dump was installed) ---
+# The derived data still mirrors the previous dump, so comparing it row by row with the new dump
+# yields the inserted, changed and deleted rows without keeping the old dump around.
+def apply_row_diff(conn, table, key_col, columns, source, source_where="1", fts_table=None, fts_columns=(),
+                   compare_columns=None):
+    """Brings main.table up to date with the rows of the new dump and returns the counts
+    {'reused', 'inserted', 'changed', 'deleted'}. columns maps every column of table to its SQL
+    expression over the source row 's' (source is e.g. 'dump."lyrics" s'), rows are matched by key_col.
+    compare_columns are the columns compared to find changed rows (default: all); the others
+    are only computed for new or changed rows, e.g. an expensive hash.
+    fts_table is an external-content FTS index over table that is kept in sync."""
+    key_expr = columns[key_col]
+    column_list = ', '.join(f'"{column}"' for column in columns)
+    compared = columns if compare_columns is None else compare_columns
+    differs = ' OR '.join(f'({columns[column]}) IS NOT x."{column}"' for column in compared if column != key_col) or '0'
+    conn.execute("DROP TABLE IF EXISTS temp.update_stale;")
+    conn.execute("DROP TABLE IF EXISTS temp.update_fresh;")
+    # Stale = deleted or changed in the new dump (with the old values, which the FTS 'delete' needs)
+    conn.execute(f"""
+        CREATE TEMP TABLE update_stale AS
+        SELECT {', '.join(f'x."{column}" AS "{column}"' for column in columns)}
+        FROM main."{table}" x
+        LEFT JOIN {source} ON ({key_expr}) = x."{key_col}"
+        WHERE ({key_expr}) IS NULL OR NOT ({source_where}) OR {differs};
+    """)
+    if fts_table:
+        fts_column_list = ', '.join(f'"{column}"' for column in fts_columns)
+        conn.execute(f"""
+            INSERT INTO main."{fts_table}" ("{fts_table}", rowid, {fts_column_list})
+            SELECT 'delete', "{key_col}", {fts_column_list} FROM temp.update_stale;
+        """)
+    conn.execute(f'DELETE FROM main."{table}" WHERE "{key_col}" IN (SELECT "{key_col}" FROM temp.update_stale);')
+    # Fresh = inserted or changed (everything the table doesn't have anymore)
+    conn.execute(f"""
+        CREATE TEMP TABLE update_fresh AS
+        SELECT {', '.join(f'{expr} AS "{column}"' for column, expr in columns.items())}
+        FROM {source}
+        WHERE ({source_where}) AND ({key_expr}) NOT IN (SELECT "{key_col}" FROM main."{table}");
+    """)
+    conn.execute(f'INSERT INTO main."{table}" ({column_list}) SELECT {column_list} FROM temp.update_fresh;')
+    if fts_table:
+        conn.execute(f"""
+            INSERT INTO main."{fts_table}" (rowid, {fts_column_list})
+            SELECT "{key_col}", {fts_column_list} FROM temp.update_fresh;
+        """)
+    stale, fresh, changed, total = conn.execute(f"""
+        SELECT (SELECT count(*) FROM temp.update_stale),
+               (SELECT count(*) FROM temp.update_fresh),
+               (SELECT count(*) FROM temp.update_fresh WHERE "{key_col}" IN (SELECT "{key_col}" FROM temp.update_stale)),
+               (SELECT count(*) FROM main."{table}");
+    """).fetchone()
+    conn.execute("DROP TABLE temp.update_stale;")
+    conn.execute("DROP TABLE temp.update_fresh;")
+    return {'reused': total - fresh, 'inserted': fresh - changed, 'changed': changed, 'deleted': stale - changed}
+
+def optimize_fts(conn, fts_table):
+    """Merges an FTS5 index into one segment (every update transaction adds segments that each query searches)."""
+    conn.execute(f"INSERT INTO \"{fts_table}\"(\"{fts_table}\") VALUES('optimize');")
+
+def _lyrics_source_where(text_col):
+    return f's."{text_col}" IS NOT NULL AND s."{text_col}" != \'\''
+
+def _update_lyrics_index(conn):
+    return apply_row_diff(conn, LYRICS_INDEX_TEXT_TABLE, LYRICS_ID_COL, {
+        LYRICS_ID_COL: f's."{LYRICS_ID_COL}"',
+        LYRICS_FK_COL: f's."{LYRICS_FK_COL}"',
+        LYRICS_TEXT_COL: f's."{LYRICS_TEXT_COL}"',
+    }, f'dump."{LYRICS_TABLE}" s', _lyrics_source_where(LYRICS_TEXT_COL),
+        fts_table=LYRICS_INDEX_FTS_TABLE, fts_columns=(LYRICS_TEXT_COL,))
+
+def _update_phrase_index(conn):
+    return apply_row_diff(conn, PHRASE_INDEX_TEXT_TABLE, LYRICS_ID_COL, {
+        LYRICS_ID_COL: f's."{LYRICS_ID_COL}"',
+        LYRICS_FK_COL: f's."{LYRICS_FK_COL}"',
+        LYRICS_TEXT_COL: f's."{LYRICS_TEXT_COL}"',
+    }, f'dump."{LYRICS_TABLE}" s', _lyrics_source_where(LYRICS_TEXT_COL),
+        fts_table=PHRASE_INDEX_FTS_TABLE, fts_columns=(LYRICS_TEXT_COL,))
+
+def _update_fuzzy_index(conn):
+    counts = apply_row_diff(conn, FUZZY_INDEX_TEXT_TABLE, TRACK_ID_COL, {
+        TRACK_ID_COL: f's."{TRACK_ID_COL}"',
+        'title': f'fold_text(s."{TRACK_TITLE_COL}")',
+        'artist': f'fold_text(s."{TRACK_ARTIST_COL}")',
+    }, f'dump."{TRACKS_TABLE}" s', fts_table=FUZZY_INDEX_FTS_TABLE, fts_columns=('title', 'artist'))
+    _copy_fuzzy_grams(conn) # Also creates the table in indexes built without it
+    return counts
+
+def _update_exact_index(conn):
+    return apply_row_diff(conn, EXACT_INDEX_KEYS_TABLE, 'track_id', {
+        'title': f'fold_text(s."{TRACK_TITLE_COL}")',
+        'artist': f'fold_text(s."{TRACK_ARTIST_COL}")',
+        'missing_lyrics': f"""s."{TRACK_ID_COL}" NOT IN (
+            SELECT "{LYRICS_FK_COL}" FROM dump."{LYRICS_TABLE}" s WHERE {_lyrics_source_where(LYRICS_TEXT_COL)}
+        )""",
+        'track_id': f's."{TRACK_ID_COL}"',
+    }, f'dump."{TRACKS_TABLE}" s')
+
+def _update_popularity_index(conn):
+    # Copy counts depend on all tracks of a song, so the (cheap) scores are computed again
+    rows = _build_popularity_index_tables(conn)
+    return {'reused': 0, 'inserted': rows, 'changed': 0, 'deleted': 0}
+
+def _update_fingerprint_index(conn):
+    if 'text_crc32' not in {row[1] for row in conn.execute(f'PRAGMA table_info("{FINGERPRINT_INDEX_TABLE}");')}:
+        rows = _build_fingerprint_index_tables(conn) # Built by an older version (other columns)
+        return {'reused': 0, 'inserted': rows, 'changed': 0, 'deleted': 0}
+    # A lyrics row whose track and text checksum are unchanged keeps its fingerprint, only the rest is hashed
+    return apply_row_diff(conn, FINGERPRINT_INDEX_TABLE, 'lyrics_id', _fingerprint_columns(), f'dump."{LYRICS_TABLE}" s',
+                          _fingerprint_source_where(), compare_columns=('track_id', 'text_crc32'))
+
+# Index name (meta table) -> update function; indexes without one are rebuilt by 'index'
+SIDECAR_INDEX_UPDATES = {
+    POPULARITY_SCORES_TABLE: _update_popularity_index,
+    FINGERPRINT_INDEX_TABLE: _update_fingerprint_index,
+    LYRICS_INDEX_FTS_TABLE: _update_lyrics_index,
+    PHRASE_INDEX_FTS_TABLE: _update_phrase_index,
+    FUZZY_INDEX_FTS_TABLE: _update_fuzzy_index,
+    EXACT_INDEX_KEYS_TABLE: _update_exact_index,
+}
+SIDECAR_FTS_TABLES = (LYRICS_INDEX_FTS_TABLE, FUZZY_INDEX_FTS_TABLE, PHRASE_INDEX_FTS_TABLE) # Index name = FTS table
+
+def format_update_counts(counts):
+    return (f"{counts['reused']} rows reused, {counts['inserted']} inserted, "
+            f"{counts['changed']} changed, {counts['deleted']} deleted")
+
+def update_sidecar_indexes(db_path):
+    """Applies the changes of a new dump to all built sidecar indexes. Returns True on success."""
+    index_path = get_index_path()
+    if not os.path.exists(index_path):
+        print("INFO: No indexes built, nothing to update.", file=sys.stderr)
+        return True
+    conn = None
+    try:
+        conn = open_index_for_writing(db_path)
+        conn.create_function("fold_text", 1, fold_text, deterministic=True)
+        conn.create_function("popularity_score", 3, popularity_score, deterministic=True)
+        conn.create_function("lyrics_fingerprint", 1, lyrics_fingerprint, deterministic=True)
+        conn.create_function("text_crc32", 1, text_crc32, deterministic=True)
+        fingerprint = get_db_fingerprint(db_path)
+        built = conn.execute(f'SELECT name, source FROM "{INDEX_META_TABLE}";').fetchall()
+        for name, source in built:
+            if name not in SIDECAR_INDEX_UPDATES:
+                continue
+            if source == fingerprint:
+                print(f"INFO: Index '{name}' is up to date.", file=sys.stderr)
+                continue
+            start_time = time.perf_counter()
+            counts = SIDECAR_INDEX_UPDATES[name](conn)
+            if name in SIDECAR_FTS_TABLES:
+                optimize_fts(conn, name)
+            total = counts['reused'] + counts['inserted'] + counts['changed']
+            write_index_meta(conn, name, db_path, total)
+            conn.commit() # One transaction per index: an interrupted update leaves it unchanged
+            print(f"INFO: Index '{name}' updated in {time.perf_counter() - start_time:.1f}s: "
+                  f"{format_update_counts(counts)}.", file=sys.stderr)
+        return True
+    except sqlite3.Error as e:
+        print(f"ERROR updating indexes: {e}", file=sys.stderr)
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def update_compact_db(db_path):
+    """Applies the changes of a new dump to the compact DB (rebuilt if its format or FTS definition differs).
+    Returns True on success."""
+    compact_path = get_compact_db_path()
+    if not os.path.exists(compact_path):
+        print("INFO: No compact database built, nothing to update.", file=sys.stderr)
+        return True
+    conn = None
+    try:
+        start_time = time.perf_counter()
+        conn = sqlite3.connect(compact_path)
+        apply_pragmas(conn)
+        conn.execute('ATTACH DATABASE ? AS dump', (f'file:{db_path}?mode=ro',))
+        conn.create_function("lyrics_hash", 1, hash_lyrics, deterministic=True)
+        conn.create_function("lyrics_deflate", 1, deflate_lyrics, deterministic=True)
+        meta = dict(conn.execute(f'SELECT key, value FROM "{COMPACT_META_TABLE}";').fetchall())
+        if meta.get('source') == get_db_fingerprint(db_path):
+            print("INFO: Compact database is up to date.", file=sys.stderr)
+            return True
+        fts_columns, fts_options = get_fts_definition(conn, "dump")
+        if meta.get('format') != COMPACT_FORMAT_VERSION or get_fts_definition(conn, "main") != (fts_columns, fts_options):
+            conn.close()
+            conn = None
+            print("INFO: Compact database has an older format, building it again.", file=sys.stderr)
+            return build_compact_db(db_path)
+
+        track_counts = apply_row_diff(conn, TRACKS_TABLE, TRACK_ID_COL, {
+            column: f's."{column}"' for column in (TRACK_ID_COL, TRACK_TITLE_COL, TRACK_ARTIST_COL)
+        }, f'dump."{TRACKS_TABLE}" s')
+        # New texts first, so the rows below can reference them; identical texts are still stored once
+        new_texts = 0
+        for text_col in (LYRICS_TEXT_COL, LYRICS_SYNCED_COL):
+            new_texts += conn.execute(f"""
+                INSERT OR IGNORE INTO "{COMPACT_LYRICS_TEXTS_TABLE}" (hash, data)
+                SELECT lyrics_hash("{text_col}"), lyrics_deflate("{text_col}")
+                FROM dump."{LYRICS_TABLE}"
+                WHERE "{text_col}" IS NOT NULL
+                  AND lyrics_hash("{text_col}") NOT IN (SELECT hash FROM "{COMPACT_LYRICS_TEXTS_TABLE}");
+            """).rowcount
+        text_id = 'SELECT x.id FROM "{0}" x WHERE x.hash = lyrics_hash(s."{1}")'
+        lyrics_counts = apply_row_diff(conn, COMPACT_LYRICS_ROWS_TABLE, LYRICS_ID_COL, {
+            LYRICS_ID_COL: f's."{LYRICS_ID_COL}"',
+            LYRICS_FK_COL: f's."{LYRICS_FK_COL}"',
+            'text_id': f'({text_id.format(COMPACT_LYRICS_TEXTS_TABLE, LYRICS_TEXT_COL)})',
+            'synced_text_id': f'({text_id.format(COMPACT_LYRICS_TEXTS_TABLE, LYRICS_SYNCED_COL)})',
+        }, f'dump."{LYRICS_TABLE}" s')
+        removed_texts = conn.execute(f"""
+            DELETE FROM "{COMPACT_LYRICS_TEXTS_TABLE}"
+            WHERE id NOT IN (SELECT text_id FROM "{COMPACT_LYRICS_ROWS_TABLE}" WHERE text_id IS NOT NULL)
+              AND id NOT IN (SELECT synced_text_id FROM "{COMPACT_LYRICS_ROWS_TABLE}" WHERE synced_text_id IS NOT NULL);
+        """).rowcount
+        fts_counts = apply_row_diff(conn, FTS_TABLE, 'rowid', {
+            'rowid': 's.rowid', **{column: f's."{column}"' for column in fts_columns}
+        }, f'dump."{FTS_TABLE}" s')
+        optimize_fts(conn, FTS_TABLE)
+
+        conn.executemany(f'INSERT OR REPLACE INTO "{COMPACT_META_TABLE}" VALUES (?, ?);', [
+            ('source', get_db_fingerprint(db_path)),
+            ('built_at', time.strftime('%Y-%m-%d %H:%M:%S')),
+        ])
+        conn.commit()
+        _compact_db_checked.clear()
+        print(f"INFO: Compact database updated in {time.perf_counter() - start_time:.1f}s.", file=sys.stderr)
+        print(f"INFO:   tracks: {format_update_counts(track_counts)}", file=sys.stderr)
+        print(f"INFO:   lyrics: {format_update_counts(lyrics_counts)} "
+              f"({new_texts} new texts, {removed_texts} unused texts removed)", file=sys.stderr)
+        print(f"INFO:   {FTS_TABLE}: {format_update_counts(fts_counts)}", file=sys.stderr)
+        return True
+    except (sqlite3.Error, OSError) as e:
+        print(f"ERROR updating compact database: {e}", file=sys.stderr)
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def update_result_cache(db_path):
+    """Drops the persistent result cache if it belongs to another dump (rankings depend on the whole dump)."""
+    if not current_result_cache_file or not os.path.exists(current_result_cache_file):
+        return
+    try:
+        with contextlib.closing(sqlite3.connect(current_result_cache_file)) as conn:
+            source = conn.execute("SELECT value FROM cache_meta WHERE key = 'source';").fetchone()
+            entries = conn.execute("SELECT count(*) FROM cache_entries;").fetchone()[0]
+    except sqlite3.Error:
+        return
+    if source and source[0] != get_result_cache_fingerprint(db_path):
+        get_result_cache(db_path) # Opening the cache for the new dump clears it
+        print(f"INFO: Result cache: {entries} entries dropped (cached rankings can change with any new row).", file=sys.stderr)
+
+def main_update(args):
+    """Brings all derived data (compact DB, indexes, result cache) up to date with a newer dump."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="lyrics-search update",
+                                     description="Apply the changes of a newer dump to the compact database, indexes and caches.")
+    parser.parse_args(args)
+    if not current_db_path or not os.path.exists(current_db_path):
+        print(f"ERROR: Database path '{current_db_path}' invalid or not set.", file=sys.stderr)
+        sys.exit(1)
+    start_time = time.perf_counter()
+    success = update_compact_db(current_db_path)
+    success = update_sidecar_indexes(current_db_path) and success
+    update_result_cache(current_db_path)
+    print(f"INFO: Update finished in {time.perf_counter() - start_time:.1f}s.", file=sys.stderr)
+    sys.exit(0 if success else 1)
+
+
+# --- Database Health Check (doctor) ---
+def explain_plan(conn, sql, params=()):
+    """Returns the EXPLAIN QUERY PLAN lines of a query."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+def fts_segment_count(conn, schema, fts_table):
+    """Number of b-tree segments of an FTS5 index (1 after 'optimize', each unmerged segment is searched separately)."""
+    return conn.execute(f'SELECT count(DISTINCT segid) FROM "{schema}"."{fts_table}_idx";').fetchone()[0]
+
+def inspect_database(db_path):
+    """Checks the DB the searches use (the compact DB if present) and the sidecar indexes.
+    Returns a list of findings (ok, message, details, fix) where fix is 'compact', 'update', 'optimize' or None."""
+    findings = []
+    search_db = resolve_search_db(db_path)
+    # Our own compact DB can be fixed in place, problems of the dump need the compact DB
+    own_fix = 'optimize' if search_db != db_path else 'compact'
+    conn = open_database(db_path)
+    try:
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view');")}
+        missing = [name for name in (TRACKS_TABLE, LYRICS_TABLE, FTS_TABLE) if name not in names]
+        if missing:
+            findings.append((False, f"Missing tables: {', '.join(missing)} (is this an lrclib dump?)", [], None))
+            return findings
+        findings.append((True, f"Tables {TRACKS_TABLE}, {LYRICS_TABLE} and {FTS_TABLE} exist", [], None))
+
+        fts_plan = explain_plan(conn, f'SELECT rowid FROM "{FTS_TABLE}" WHERE "{FTS_TABLE}" MATCH ? ORDER BY rank LIMIT ?;', ('x', 1))
+        details_plan = explain_plan(conn, get_details_sql(3), (1, 2, 3))
+        # A scan or an automatic (per query) index on the lyrics side means the track_id index is missing
+        details_ok = not any(('SCAN' in line and 'VIRTUAL TABLE' not in line) or 'AUTOMATIC' in line for line in details_plan)
+        # FTS5 shows a MATCH constraint as 'M' in the index string; a full scan has none and sorts for the rank
+        fts_ok = any(re.search(r'VIRTUAL TABLE INDEX \d+:\S*M', line) for line in fts_plan) and \
+            not any('TEMP B-TREE' in line for line in fts_plan)
+        if fts_ok:
+            findings.append((True, "FTS search uses the full-text index", fts_plan, None))
+        else:
+            findings.append((False, "FTS search does not use the full-text index (scans and sorts all tracks)", fts_plan, None))
+        if details_ok:
+            findings.append((True, f"Details join uses an index on {LYRICS_TABLE}.{LYRICS_FK_COL}", details_plan, None))
+        else:
+            findings.append((False, f"No index on {LYRICS_TABLE}.{LYRICS_FK_COL}: every search scans the lyrics",
+                             details_plan, 'compact'))
+
+        segments = fts_segment_count(conn, "main", FTS_TABLE)
+        if segments > 1:
+            findings.append((False, f"{FTS_TABLE} has {segments} unmerged segments (not optimized)", [], own_fix))
+        else:
+            findings.append((True, f"{FTS_TABLE} is merged into {segments} segment", [], None))
+
+        has_stats = 'sqlite_stat1' in {row[0] for row in conn.execute("SELECT name FROM sqlite_master;")} and \
+            conn.execute("SELECT count(*) FROM sqlite_stat1;").fetchone()[0] > 0
+        if has_stats:
+            findings.append((True, "ANALYZE statistics are present", [], None))
+        else:
+            findings.append((False, "No ANALYZE statistics (the query planner has to guess)", [], own_fix))
+
+        fingerprint = get_db_fingerprint(db_path)
+        if os.path.exists(get_index_path()):
+            attach_index(conn, db_path)
+            for name, source in conn.execute(f'SELECT name, source FROM "{INDEX_SCHEMA}"."{INDEX_META_TABLE}";'):
+                if source != fingerprint:
+                    findings.append((False, f"Index '{name}' was built for another dump", [], 'update'))
+                elif name in SIDECAR_FTS_TABLES and fts_segment_count(conn, INDEX_SCHEMA, name) > 1:
+                    findings.append((False, f"Index '{name}' has unmerged segments", [], 'optimize'))
+                else:
+                    findings.append((True, f"Index '{name}' is up to date", [], None))
+    finally:
+        conn.close()
+    findings.extend(check_connection_settings(db_path))
+    if search_db == db_path:
+        findings.insert(0, (True, f"Searching the dump '{db_path}' directly (no compact database)", [], None))
+    else:
+        findings.insert(0, (True, f"Searching the compact database '{search_db}'", [], None))
+    return findings
+
+def print_findings(findings, verbose=True):
+    for ok, message, details, _ in findings:
+        print(f"[{' OK ' if ok else 'FAIL'}] {message}")
+        if verbose:
+            for line in details:
+                print(f"       plan: {line}")
+
+def measure_search_latency(db_path, queries):
+    """p50/p95 of title/artist/miss searches (warm), using the DB the searches currently use."""
+    workload = build_bench_workload(db_path, queries, 0)
+    return run_bench_pass(db_path, workload, current_max_matches, cold=False)["all"]
+
+def fix_findings(db_path, findings):
+    """Applies the fixes of the findings. The dump is never modified: missing indexes, merged FTS segments
+    and statistics go into the compact DB (a writable copy), stale sidecar indexes are updated. Returns True on success."""
+    fixes = {fix for ok, _, _, fix in findings if not ok and fix}
+    success = True
+    if 'compact' in fixes:
+        success = build_compact_db(db_path) and success
+    if 'update' in fixes:
+        success = update_sidecar_indexes(db_path) and success
+    if 'optimize' in fixes and 'compact' not in fixes:
+        compact_path = resolve_search_db(db_path)
+        targets = [(compact_path, (FTS_TABLE,))] if compact_path != db_path else []
+        if os.path.exists(get_index_path()):
+            targets.append((get_index_path(), SIDECAR_FTS_TABLES))
+        for path, fts_tables in targets:
+            try:
+                with contextlib.closing(sqlite3.connect(path)) as conn:
+                    for name in fts_tables:
+                        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?;", (name,)).fetchone():
+                            optimize_fts(conn, name)
+                    conn.execute("ANALYZE;")
+                    conn.commit()
+            except sqlite3.Error as e:
+                print(f"ERROR optimizing '{path}': {e}", file=sys.stderr)
+                success = False
+    return success
+
+def main_doctor(args):
+    """Checks the configured database and indexes, optionally fixes the problems and compares the latency."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="lyrics-search doctor", description="Check the database and indexes for slow query plans.")
+    parser.add_argument("--fix", action="store_true", help="build what is missing (compact database, index updates)")
+    parser.add_argument("--queries", type=int, default=30, help="queries of each kind for the latency comparison (default: 30)")
+    options = parser.parse_args(args)
+    if not current_db_path or not os.path.exists(current_db_path):
+        print(f"ERROR: Database path '{current_db_path}' invalid or not set.", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        findings = inspect_database(current_db_path)
+    except sqlite3.Error as e:
+        print(f"ERROR inspecting database: {e}", file=sys.stderr)
+        sys.exit(1)
+    print_findings(findings)
+    problems = [finding for finding in findings if not finding[0]]
+    if not problems:
+        print("No problems found.")
+        sys.exit(0)
+    if not any(fix for _, _, _, fix in problems):
+        sys.exit(1)
+    if not options.fix:
+        print("\nRun 'doctor --fix' to fix this (the database itself is not modified).")
+        sys.exit(1)
+
+    before = measure_search_latency(current_db_path, options.queries)
+    success = fix_findings(current_db_path, findings)
+    after = measure_search_latency(current_db_path, options.queries)
+    print()
+    print_findings(inspect_database(current_db_path), verbose=False)
+    print(f"\nSearch latency before: p50 {before['p50_ms']} ms, p95 {before['p95_ms']} ms")
+    print(f"Search latency after:  p50 {after['p50_ms']} ms, p95 {after['p95_ms']} ms")
+    sys.exit(0 if success else 1)
+
+def check_database_setup(db_path):
+    """Health check at the end of the setup: shows problems and offers to fix them."""
+    try:
+        findings = inspect_database(db_path)
+    except sqlite3.Error as e:
+        print(f"WARNING: Could not inspect the database: {e}")
+        return
+    problems = [finding for finding in findings if not finding[0]]
+    if not problems:
+        print("Database check: no problems found.")
+        return
+    print("\nDatabase check:")
+    print_findings(problems, verbose=False)
+    if any(fix for _, _, _, fix in problems):
+        answer = input("Fix this now? Creates an optimized copy, can take a while (y/n): ").strip().lower()
+        if answer == 'y':
+            print("Fixed." if fix_findings(db_path, findings) else "Could not fix everything, details above.")
 
 
 # --- Main Function for Interactive Mode ---
@@ -388,11 +2705,9 @@ def main_interactive():
                 clear_screen(); print("--- Search by Title/Artist ---")
                 search_query = input("Search term: ")
                 if not search_query: print("No search term entered."); wait_for_enter(); continue
-                # Call search with current config values
-                found_tracks = search_tracks_and_lyrics(current_db_path, search_query, current_max_matches)
+                # Call search with current config values, tracks are printed as they arrive
                 clear_screen()
-                if found_tracks is None: print("\nAn error occurred during the search. Details above.")
-                else: display_results(found_tracks)
+                search_tracks_and_display(current_db_path, search_query, current_max_matches)
                 wait_for_enter() # Wait after displaying results
             except (KeyboardInterrupt, EOFError): clear_screen(); print("\nSearch cancelled."); wait_for_enter(); continue
         
@@ -405,7 +2720,8 @@ def main_interactive():
                 if not search_query:
                     print("No search term entered."); wait_for_enter(); continue
                 # Search within Lyrics
-                found_tracks = search_in_lyrics_and_display(current_db_path, search_query, current_max_matches)
+                clear_screen()
+                search_in_lyrics_and_display(current_db_path, search_query, current_max_matches)
                 wait_for_enter()
             except (KeyboardInterrupt, EOFError):
                 clear_screen(); print("\nSearch cancelled."); wait_for_enter(); continue
@@ -425,41 +2741,32 @@ def main_interactive():
             wait_for_enter()
             # Loop continues -> Clear + Banner + Menu
 
-        elif choice == '6': # Exit Program (was 2, then 4)
+        elif choice == '6': # Build Search Indexes (new)
+            try:
+                run_build_index()
+            except (KeyboardInterrupt, EOFError):
+                clear_screen(); print("\nBuild cancelled."); wait_for_enter(); continue
+
+        elif choice == '7': # Exit Program (was 2, then 4, then 6)
             clear_screen(); print("Exiting program."); sys.exit(0)
         # *******************************************
 
         else: # Invalid choice
-            clear_screen(); print("Invalid choice. Please enter 1, 2, 3, 4, or 5."); wait_for_enter()
+            clear_screen(); print("Invalid choice. Please enter a number from 1 to 7."); wait_for_enter()
             # Loop continues -> Clear + Banner + Menu
 
 # --- Main Function for Lookup Mode ---
-def main_lookup(search_term):
-    """Performs a single search and prints JSON output."""
-    # Config was already loaded in __main__
-    if not current_db_path:
-        print(json.dumps({"error": "Configuration error: Database path not set"}), file=sys.stdout)
-        sys.exit(1)
-    if not os.path.exists(current_db_path):
-         print(json.dumps({"error": f"Configuration error: Database file not found at '{current_db_path}'"}), file=sys.stdout)
-         sys.exit(1)
-
-
-    # Perform search for exactly 1 result
-    found_tracks = search_tracks_and_lyrics(current_db_path, search_term, 1)
-
+def build_lookup_response(found_tracks):
+    """Turns the result of a 1-result search into the lookup JSON object. Returns (response, exit_code)."""
     if found_tracks is None:
         # Serious search error (DB problem, FTS problem, etc.)
-        print(json.dumps({"error": "Search execution failed"}), file=sys.stdout)
-        sys.exit(1)
+        return {"error": "Search execution failed"}, 1
     elif not found_tracks:
         # No results found
-        print(json.dumps({"error": "No matching track found"}), file=sys.stdout)
-        sys.exit(0) # Not an error per se, just no result
+        return {"error": "No matching track found"}, 0 # Not an error per se, just no result
     elif 'error' in found_tracks[0]:
-         # Error fetching details AFTER successful FTS search
-         print(json.dumps({"error": found_tracks[0]['error']}), file=sys.stdout)
-         sys.exit(1)
+        # Error fetching details AFTER successful FTS search
+        return {"error": found_tracks[0]['error']}, 1
     else:
         # Successful result
         track_data = found_tracks[0]
@@ -468,73 +2775,1228 @@ def main_lookup(search_term):
             "artist_name": track_data.get(TRACK_ARTIST_COL),
             "plain_lyrics": track_data.get(LYRICS_TEXT_COL) # Remains None if not available
         }
-        # Print JSON to stdout, compact for APIs
-        print(json.dumps(result_json, ensure_ascii=False, separators=(',', ':')), file=sys.stdout)
+        if 'similarity' in track_data:
+            result_json["similarity"] = track_data['similarity'] # Only in fuzzy mode
+        if 'alternatives' in track_data:
+            result_json["alternatives"] = track_data['alternatives'] # Only with collapse
+        return result_json, 0
+
+def format_lookup_response(response):
+    """Serializes a lookup response exactly like the lookup argument prints it."""
+    if 'error' in response:
+        return json.dumps(response)
+    # Compact for APIs
+    return json.dumps(response, ensure_ascii=False, separators=(',', ':'))
+
+def check_lookup_config():
+    """Exits with a JSON error if the configured database can't be used for lookups."""
+    if not current_db_path:
+        print(json.dumps({"error": "Configuration error: Database path not set"}), file=sys.stdout)
+        sys.exit(1)
+    if not os.path.exists(current_db_path):
+         print(json.dumps({"error": f"Configuration error: Database file not found at '{current_db_path}'"}), file=sys.stdout)
+         sys.exit(1)
+
+def run_lookup(query, options=None, conn=None):
+    """Answers one lookup query. Returns (response, exit_code).
+    query is a search term or a dictionary with "title" and "artist" (exact match first, then FTS).
+    query can also be {"page_token": ...} from an earlier answer, which returns the next result,
+    or {"lyrics": snippet} (like the option 'lyrics' for a search term, see lyrics_lookup).
+    options: {'fuzzy': bool, 'synced': bool, 'between': (t1, t2) or None, 'paginate': bool, 'lyrics': bool,
+    'collapse': bool}."""
+    options = options or {}
+    found_tracks = None
+    exact = False
+    after = None
+    if isinstance(query, dict) and 'page_token' in query:
+        try:
+            mode, query, after = decode_page_token(query['page_token'])
+        except ValueError as e:
+            return {"error": str(e)}, 1
+        if mode in LYRICS_PAGE_MODES:
+            return lyrics_lookup(query, dict(options, paginate=True), conn, after, mode)
+        if mode not in ('tracks', 'tracks-collapsed'):
+            return {"error": "Invalid page token"}, 1
+        options = dict(options, paginate=True, fuzzy=False, collapse=mode == 'tracks-collapsed')
+    elif isinstance(query, dict) and 'lyrics' in query:
+        return lyrics_lookup(query['lyrics'], options, conn)
+    elif options.get('lyrics') and isinstance(query, str):
+        return lyrics_lookup(query, options, conn)
+    elif isinstance(query, dict):
+        if not options.get('fuzzy'):
+            found_tracks = exact_lookup(current_db_path, query.get('title'), query.get('artist'), 1, conn=conn)
+            exact = bool(found_tracks)
+        query = title_artist_query(query.get('title'), query.get('artist'))
+    next_cursor = None
+    if exact:
+        pass
+    elif options.get('fuzzy'):
+        # Ranked by similarity, not by the FTS rank a page cursor continues after: one page only
+        found_tracks = fuzzy_search(current_db_path, query, 1, conn=conn)
+    elif options.get('paginate'):
+        found_tracks, next_cursor = search_tracks_page(current_db_path, query, 1, after, conn=conn,
+                                                       collapse=options.get('collapse'))
+    else:
+        found_tracks = cached_search(current_db_path, query, 1, conn=conn, collapse=options.get('collapse'))
+    response, exit_code = build_lookup_response(found_tracks)
+    if 'error' in response:
+        return response, exit_code
+    if exact:
+        response["match"] = "exact"
+    if options.get('paginate'):
+        mode = 'tracks-collapsed' if options.get('collapse') else 'tracks'
+        response["next_page_token"] = encode_page_token(mode, query, next_cursor) if next_cursor else None
+    if options.get('synced'):
+        track_id = found_tracks[0][TRACK_ID_COL]
+        if conn is None:
+            with contextlib.closing(open_database(current_db_path)) as own_conn:
+                synced = fetch_synced_lyrics(own_conn, track_id)
+        else:
+            synced = fetch_synced_lyrics(conn, track_id)
+        response["synced_lyrics"] = synced.to_json(*(options.get('between') or ())) if synced else None
+    return response, exit_code
+
+def main_lookup(search_term, options=None):
+    """Performs a single search and prints JSON output."""
+    # Config was already loaded in __main__
+    check_lookup_config()
+
+    profiler = query_profiler
+    if profiler:
+        profiler.begin('lookup', search_term if isinstance(search_term, str) else json.dumps(search_term))
+
+    # Perform search for exactly 1 result
+    response, exit_code = run_lookup(search_term, options)
+    output = format_lookup_response(response)
+    if profiler:
+        profiler.phase('json_encode')
+    print(output, file=sys.stdout)
+    if profiler:
+        profiler.phase('output')
+        profiler.finish(current_db_path)
+    sys.exit(exit_code)
+
+# --- Batch Lookup Mode ---
+def parse_batch_line(line):
+    """Turns one batch input line into a query for run_lookup. Returns (query, error).
+    A line is either a plain search term or a JSON object with "title"/"artist" (or "query", "lyrics")."""
+    if not line.startswith('{'):
+        return line, None
+    try:
+        item = json.loads(line)
+    except ValueError:
+        return None, "Invalid JSON input line"
+    if not isinstance(item, dict):
+        return None, "Invalid JSON input line"
+    if item.get('page_token'):
+        return {'page_token': str(item['page_token'])}, None
+    if item.get('lyrics'):
+        return {'lyrics': str(item['lyrics'])}, None
+    if item.get('query'):
+        return str(item['query']), None
+    title, artist = str(item.get('title') or ''), str(item.get('artist') or '')
+    if not (title + artist).strip():
+        return None, "Input line has no title/artist"
+    return {'title': title, 'artist': artist}, None
+
+def lookup_batch_line(line, conn, options=None):
+    """Answers one batch input line with an open connection. Returns the JSON line (without newline)."""
+    query, error = parse_batch_line(line)
+    if error:
+        response = {"error": error}
+    else:
+        response, _ = run_lookup(query, options, conn=conn)
+    return format_lookup_response(response)
+
+def main_lookup_batch(source, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, options=None):
+    """Looks up one query per input line (file or '-' for stdin) and prints one JSON line per query."""
+    check_lookup_config()
+    try:
+        input_file = sys.stdin if source == '-' else open(source, 'r', encoding='utf-8')
+    except IOError as e:
+        print(f"ERROR reading batch input '{source}': {e}", file=sys.stderr)
+        sys.exit(1)
+
+    lines = (line.strip() for line in input_file if line.strip())
+    conn = None
+    lookup_count = 0
+    start_time = time.perf_counter()
+    try:
+        if workers > 1:
+            output_lines = run_parallel(_lookup_worker_chunk, _lookup_worker_init, (current_db_path, options),
+                                        lines, workers, chunk_size)
+        else:
+            # One connection for all queries; sqlite3 caches the prepared statements per connection
+            conn = open_database(current_db_path)
+            output_lines = (lookup_batch_line(line, conn, options) for line in lines)
+        for output_line in output_lines:
+            sys.stdout.write(output_line + "\n")
+            lookup_count += 1
+    finally:
+        if conn:
+            conn.close()
+        if input_file is not sys.stdin:
+            input_file.close()
+        sys.stdout.flush()
+
+    elapsed = time.perf_counter() - start_time
+    rate = lookup_count / elapsed if elapsed > 0 else 0.0
+    print(f"INFO: {lookup_count} lookups in {elapsed:.2f}s ({rate:.1f} lookups/s, {workers} worker(s))", file=sys.stderr)
+    cache = get_result_cache(current_db_path)
+    if cache is not None and workers <= 1: # Workers have their own caches
+        cache_stats = cache.stats()
+        print(f"INFO: Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses", file=sys.stderr)
+    sys.exit(0)
+
+def main_lookup_args(args):
+    """Parses the arguments of 'lookup' (single search term or --batch)."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="lyrics-search lookup", description="Print the first matching track as JSON.")
+    parser.add_argument("search_term", nargs="?", help="search query")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="read one query (or JSON object with title/artist) per line from FILE or stdin, print NDJSON")
+    parser.add_argument("--workers", type=int, default=current_workers,
+                        help=f"worker processes for --batch, 0 = one per CPU core (default: {current_workers})")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"queries per work package for the workers (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--cache-stats", action="store_true", help="print the result cache counters as JSON")
+    parser.add_argument("--profile", action="store_true", help="log per-phase timings to stderr (or profile_log)")
+    parser.add_argument("--fuzzy", action="store_true", help="typo-tolerant title/artist match (needs 'index fuzzy')")
+    parser.add_argument("--title", help="exact title (folded; needs 'index exact', falls back to the search)")
+    parser.add_argument("--artist", help="exact artist, used together with --title")
+    parser.add_argument("--synced", action="store_true", help="add the synced lyrics as [[seconds, line], ...]")
+    parser.add_argument("--between", nargs=2, type=float, metavar=("T1", "T2"),
+                        help="only the synced lines shown from T1 to T2 seconds (implies --synced)")
+    parser.add_argument("--paginate", action="store_true", help="add a next_page_token to every answer")
+    parser.add_argument("--page-token", metavar="TOKEN", help="return the result after an earlier answer's next_page_token")
+    parser.add_argument("--collapse", action="store_true",
+                        help="one result per song: copies with the same lyrics count as alternatives (needs 'index fingerprints')")
+    parser.add_argument("--lyrics", action="store_true",
+                        help="the search term is a lyric snippet: ranked tracks with highlighted context (needs 'index phrases')")
+    options = parser.parse_args(args)
+    if options.between:
+        t1, t2 = options.between
+        if not (math.isfinite(t1) and math.isfinite(t2)):
+            parser.error("--between: T1 and T2 must be finite numbers")
+        if t1 > t2:
+            parser.error("--between: T1 must not be after T2")
+    lookup_options = {'fuzzy': options.fuzzy, 'synced': options.synced or bool(options.between),
+                      'between': tuple(options.between) if options.between else None, 'paginate': options.paginate,
+                      'lyrics': options.lyrics, 'collapse': options.collapse}
+    if options.profile:
+        configure_profiler(force=True)
+    if options.cache_stats:
+        check_lookup_config()
+        cache = get_result_cache(current_db_path)
+        print(json.dumps({"result_cache": cache.stats() if cache else None}))
         sys.exit(0)
+    elif options.batch:
+        workers = options.workers if options.workers > 0 else (os.cpu_count() or 1)
+        main_lookup_batch(options.batch, workers, max(1, options.chunk_size), lookup_options)
+    elif options.page_token:
+        main_lookup({'page_token': options.page_token}, lookup_options)
+    elif options.title or options.artist:
+        main_lookup({'title': options.title or '', 'artist': options.artist or ''}, lookup_options)
+    elif options.search_term:
+        main_lookup(options.search_term, lookup_options)
+    else:
+        parser.error("a search term, --title/--artist, --batch or --cache-stats is required")
+
+# --- Parallel Batch Engine ---
+_worker_conn = None # Read-only connection of a worker process
+_worker_options = None # Lookup options of a worker process
+
+def _lookup_worker_init(db_path, options=None):
+    """Initializer of a worker process: loads the config and opens its own read-only connection."""
+    global _worker_conn, _worker_options
+    _worker_options = options
+    load_config() # Needed with the 'spawn' start method (Windows/macOS), harmless with 'fork'
+    configure_profiler()
+    _worker_conn = open_database(db_path)
+
+def _lookup_worker_chunk(lines):
+    """Answers a chunk of batch input lines in a worker process."""
+    return [lookup_batch_line(line, _worker_conn, _worker_options) for line in lines]
+
+def run_parallel(chunk_func, init_func, init_args, items, workers, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Runs chunk_func over chunks of items in a pool of worker processes and yields the results in input order.
+    Only a few chunks per worker are in flight at a time, so memory stays constant for any input size."""
+    import multiprocessing
+    max_pending = workers * 4
+    pending = collections.deque()
+    with multiprocessing.Pool(workers, initializer=init_func, initargs=init_args) as pool:
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                pending.append(pool.apply_async(chunk_func, (chunk,)))
+                chunk = []
+                while len(pending) >= max_pending:
+                    yield from pending.popleft().get()
+        if chunk:
+            pending.append(pool.apply_async(chunk_func, (chunk,)))
+        while pending:
+            yield from pending.popleft().get()
+
+# --- Server Mode ---
+class ConnectionPool:
+    """A fixed set of open read-only connections shared by the server threads."""
+
+    def __init__(self, db_path, size):
+        import queue
+        self._connections = queue.Queue()
+        for _ in range(size):
+            self._connections.put(open_database(db_path, check_same_thread=False))
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Borrows a connection (waits if all are in use)."""
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+def serve_lookup(pool, search_term):
+    """Answers one lookup with a pooled connection. Returns (response, exit_code) like main_lookup."""
+    with pool.connection() as conn:
+        return run_lookup(search_term, conn=conn)
+
+def make_http_handler(pool):
+    """Creates the request handler class for 'GET /lookup?q=<search_term>'."""
+    import http.server
+    import urllib.parse
+    class LookupHTTPHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # Keep-alive, so clients don't reconnect for every lookup
+        wbufsize = -1 # Buffer headers + body into one send (avoids Nagle/delayed-ACK stalls)
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            params = urllib.parse.parse_qs(url.query)
+            search_term = params.get('q', [''])[0]
+            if 'title' in params or 'artist' in params:
+                # Structured lookup: /lookup?title=...&artist=...
+                search_term = {'title': params.get('title', [''])[0], 'artist': params.get('artist', [''])[0]}
+            elif params.get('lyrics', [''])[0]:
+                # Lyric snippet: /lookup?lyrics=...
+                search_term = {'lyrics': params['lyrics'][0]}
+            if url.path == '/stats':
+                cache = get_result_cache(current_db_path)
+                self.send_json(200, {"result_cache": cache.stats() if cache else None})
+            elif url.path != '/lookup':
+                self.send_json(404, {"error": "Unknown path, use /lookup?q=<search_term>"})
+            elif not search_term:
+                self.send_json(400, {"error": "Missing search term (parameter 'q' or 'lyrics')"})
+            else:
+                response, exit_code = serve_lookup(pool, search_term)
+                if exit_code != 0:
+                    status = 500
+                elif 'error' in response:
+                    status = 404
+                else:
+                    status = 200
+                self.send_json(status, response)
+
+        def send_json(self, status, response):
+            body = format_lookup_response(response).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Quiet, one line per request would cost more than the lookup
+
+    return LookupHTTPHandler
+
+def make_socket_handler(pool):
+    """Creates the handler for the Unix socket: one search term (or batch JSON object) per line in, one JSON line out."""
+    import socketserver
+    class LookupSocketHandler(socketserver.StreamRequestHandler):
+        wbufsize = -1 # Flushed explicitly after each answer
+        def handle(self):
+            for line in self.rfile:
+                search_term, error = parse_batch_line(line.decode('utf-8', errors='replace').strip())
+                if error:
+                    response = {"error": error}
+                elif not search_term:
+                    continue
+                else:
+                    response, _ = serve_lookup(pool, search_term)
+                self.wfile.write(format_lookup_response(response).encode('utf-8') + b"\n")
+                self.wfile.flush()
+
+    return LookupSocketHandler
+
+def main_serve(args):
+    """Runs the persistent lookup server (HTTP on localhost or a Unix socket) until interrupted."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="lyrics-search serve", description="Answer lookups from a long-running process.")
+    parser.add_argument("--socket", metavar="PATH", help="listen on this Unix socket instead of HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVE_PORT, help=f"HTTP port (default: {DEFAULT_SERVE_PORT})")
+    options = parser.parse_args(args)
+    import http.server
+    import socketserver
+
+    if not current_db_path or not os.path.exists(current_db_path):
+        print(f"ERROR: Database path '{current_db_path}' invalid or not set.", file=sys.stderr)
+        sys.exit(1)
+
+    pool = ConnectionPool(current_db_path, current_serve_connections)
+    if options.socket:
+        if os.path.exists(options.socket):
+            os.remove(options.socket) # Stale socket from an earlier run
+        server = socketserver.ThreadingUnixStreamServer(options.socket, make_socket_handler(pool))
+        address = options.socket
+    else:
+        server = http.server.ThreadingHTTPServer((options.host, options.port), make_http_handler(pool))
+        address = f"http://{options.host}:{options.port}/lookup?q=<search_term>"
+    server.daemon_threads = True
+
+    print(f"INFO: Serving lookups on {address} ({current_serve_connections} connections, Ctrl+C to stop)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nINFO: Server stopped.", file=sys.stderr)
+    finally:
+        server.server_close()
+        pool.close()
+        if options.socket and os.path.exists(options.socket):
+            os.remove(options.socket)
+
+# --- Async API (for asyncio services embedding the search) ---
+class _AsyncJob:
+    """State of one async query, read by the progress handler of the reader thread running it."""
+    __slots__ = ('cancelled',)
+
+    def __init__(self):
+        self.cancelled = False
+
+class AsyncSearchPool:
+    """Runs searches for asyncio code on dedicated reader threads, each with its own read-only connection.
+    At most max_pending queries are queued or running, further callers wait (backpressure).
+    A cancelled (or timed out) query is interrupted inside SQLite by the progress handler."""
+
+    def __init__(self, db_path=None, threads=None, max_pending=None, timeout=None):
+        self.db_path = db_path or current_db_path
+        if not self.db_path or not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"Database path '{self.db_path}' invalid or not set.")
+        self.threads = max(1, threads or current_serve_connections)
+        self.max_pending = max(self.threads, max_pending or self.threads * 4)
+        self.timeout = timeout # Default timeout in seconds for every query (None = no timeout)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._slots = None # asyncio.Semaphore, created in the running event loop
+        import concurrent.futures
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            self.threads, thread_name_prefix="lyrics-search-reader", initializer=self._init_thread)
+
+    def _init_thread(self):
+        conn = open_database(self.db_path, check_same_thread=False) # Closed by close() from another thread
+        conn.set_progress_handler(self._check_cancelled, ASYNC_PROGRESS_STEPS)
+        self._local.conn = conn
+        self._local.job = None
+        with self._connections_lock:
+            self._connections.append(conn)
+
+    def _check_cancelled(self):
+        # Progress handler: a non-zero return value interrupts the running statement
+        job = self._local.job
+        return 1 if job is not None and job.cancelled else 0
+
+    def _run_job(self, job, func, args):
+        if job.cancelled:
+            import concurrent.futures
+            raise concurrent.futures.CancelledError()
+        self._local.job = job
+        try:
+            return func(self._local.conn, *args)
+        finally:
+            self._local.job = None
+
+    async def run(self, func, *args, timeout=None):
+        """Runs func(conn, *args) on a reader thread and returns its result.
+        Raises TimeoutError after timeout seconds (default: the pool timeout), including the time spent waiting."""
+        import asyncio
+        timeout = self.timeout if timeout is None else timeout
+        async with asyncio.timeout(timeout):
+            loop = asyncio.get_running_loop()
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(self.max_pending)
+            await self._slots.acquire()
+            job = _AsyncJob()
+            try:
+                future = self._executor.submit(self._run_job, job, func, args)
+            except BaseException:
+                self._slots.release()
+                raise
+            # The slot is freed when the thread is really done, not when the caller stops waiting
+            future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._slots.release))
+            try:
+                return await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                job.cancelled = True
+                raise
+
+    async def search(self, query, limit=None, timeout=None):
+        """Title/artist search like search_tracks_and_lyrics. Returns a list of dictionaries or None on error."""
+        limit = limit or current_max_matches
+        return await self.run(lambda conn: cached_search(self.db_path, query, limit, conn=conn), timeout=timeout)
+
+    async def lookup(self, query, timeout=None, **options):
+        """Answers one lookup like the lookup argument and returns its JSON object (dictionary).
+        query can also be a dictionary with "title" and "artist" (exact lookup)."""
+        response, _ = await self.run(lambda conn: run_lookup(query, options, conn=conn), timeout=timeout)
+        return response
+
+    def close(self):
+        """Stops the reader threads (after the running queries) and closes their connections."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        import asyncio
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+_async_pool = None # Default pool of search()/lookup(), created on first use
+
+def get_async_pool():
+    """Returns the default AsyncSearchPool for the configured database (loads the config if needed)."""
+    global _async_pool
+    if _async_pool is None:
+        if current_db_path is None:
+            load_config()
+        _async_pool = AsyncSearchPool()
+        atexit.register(_async_pool.close)
+    return _async_pool
+
+async def search(query, limit=None, timeout=None):
+    """Async title/artist search on the default pool, e.g. 'await search("yesterday beatles", 5)'."""
+    return await get_async_pool().search(query, limit, timeout=timeout)
+
+async def lookup(query, timeout=None, **options):
+    """Async lookup on the default pool, e.g. 'await lookup("yesterday beatles")'
+    or 'await lookup({"title": "Yesterday", "artist": "The Beatles"})'. Returns the JSON object."""
+    return await get_async_pool().lookup(query, timeout=timeout, **options)
+
 
 # --- Search within Lyrics ---
+def fts_phrase(text):
+    """Quotes text as a single FTS5 phrase (with the trigram tokenizer: a substring match)."""
+    return '"' + text.replace('"', '""') + '"'
+
+def lyrics_snippet_query(snippet, words=False):
+    """FTS5 query for a lyric snippet: its words as one phrase (adjacent, in order),
+    or with words all of them anywhere in the lyrics. None if the snippet has no words."""
+    tokens = re.findall(r"\w+", snippet)
+    if not tokens:
+        return None
+    if words:
+        return ' AND '.join(fts_phrase(token) for token in tokens)
+    return fts_phrase(' '.join(tokens))
+
+def iter_search_phrases(conn, match_query, max_matches_limit, after=None):
+    """Yields the tracks whose lyrics match the phrase index query in bm25 order, without context
+    (see fetch_lyrics_snippet). Each track has a 'cursor'; pass the last one as after to get the next page."""
+    condition, condition_params = keyset_condition("f.rank", "f.rowid", after)
+    # Only rowid and rank in the ranked subquery: the expensive context is made for the returned rows only
+    sql = f"""
+        SELECT t."{TRACK_ID_COL}" AS track_id,
+               t."{TRACK_TITLE_COL}" AS title,
+               t."{TRACK_ARTIST_COL}" AS artist,
+               s.rowid AS lyrics_id,
+               s.rank AS rank
+        FROM (
+            SELECT f.rowid AS rowid, f.rank AS rank
+            FROM "{INDEX_SCHEMA}"."{PHRASE_INDEX_FTS_TABLE}" AS f
+            WHERE f."{PHRASE_INDEX_FTS_TABLE}" MATCH ? AND {condition}
+            ORDER BY f.rank, f.rowid
+            LIMIT ?
+        ) AS s
+        JOIN "{INDEX_SCHEMA}"."{PHRASE_INDEX_TEXT_TABLE}" x ON x."{LYRICS_ID_COL}" = s.rowid
+        JOIN "{TRACKS_TABLE}" t ON t."{TRACK_ID_COL}" = x."{LYRICS_FK_COL}"
+        ORDER BY s.rank, s.rowid;
+    """
+    params = (match_query, *condition_params, max_matches_limit)
+    if query_profiler:
+        query_profiler.statement(sql, params)
+    for row in conn.execute(sql, params):
+        yield {
+            TRACK_ID_COL: row['track_id'],
+            TRACK_TITLE_COL: row['title'],
+            TRACK_ARTIST_COL: row['artist'],
+            'lyrics_id': row['lyrics_id'],
+            'rank': row['rank'],
+            'cursor': (row['rank'], row['lyrics_id']),
+        }
+
+def fetch_lyrics_snippet(conn, match_query, lyrics_id):
+    """The context around the words of match_query in one lyrics text, matched words highlighted."""
+    row = conn.execute(f"""
+        SELECT snippet(f."{PHRASE_INDEX_FTS_TABLE}", 0, ?, ?, '…', ?)
+        FROM "{INDEX_SCHEMA}"."{PHRASE_INDEX_FTS_TABLE}" AS f
+        WHERE f."{PHRASE_INDEX_FTS_TABLE}" MATCH ? AND f.rowid = ?;
+    """, (*PHRASE_HIGHLIGHT, PHRASE_SNIPPET_TOKENS, match_query, lyrics_id)).fetchone()
+    return row[0] if row else None
+
+def lyrics_lookup(snippet, options=None, conn=None, after=None, mode=None):
+    """Answers a lookup by lyric snippet from the phrase index. Returns (response, exit_code) like run_lookup:
+    up to max_matches tracks in bm25 order, each with the highlighted context instead of the full lyrics.
+    Without a match of the whole phrase, tracks containing all its words are returned ("match": "words").
+    mode and after continue a page token."""
+    options = options or {}
+    start_time = time.perf_counter()
+    own_conn = conn is None
+    profiler = query_profiler
+    owns_profile = profiler.begin('lyrics_lookup', snippet) if profiler else False
+    try:
+        if own_conn:
+            conn = open_database(current_db_path)
+        if PHRASE_INDEX_FTS_TABLE not in attach_index(conn, current_db_path):
+            return {"error": "Phrase index not built (run 'index phrases')"}, 1
+        if profiler:
+            profiler.phase('attach_index')
+        tracks = []
+        previous_query = None
+        for page_mode in ([mode] if mode else list(LYRICS_PAGE_MODES)):
+            match_query = lyrics_snippet_query(snippet, words=LYRICS_PAGE_MODES[page_mode] == 'words')
+            if match_query is None or match_query == previous_query: # A single word is both
+                break
+            previous_query = match_query
+            page = KeysetPage(iter_search_phrases(conn, match_query, current_max_matches + 1, after), current_max_matches)
+            tracks = [dict(track, snippet=fetch_lyrics_snippet(conn, match_query, track['lyrics_id'])) for track in page]
+            if tracks:
+                mode = page_mode
+                break
+        if profiler:
+            profiler.phase('search_and_snippets')
+    except sqlite3.Error as e:
+        print(f"ERROR searching the phrase index: {e}", file=sys.stderr)
+        return {"error": "Search execution failed"}, 1
+    finally:
+        if own_conn and conn:
+            conn.close()
+        if owns_profile:
+            profiler.finish(current_db_path)
+    if not tracks:
+        return {"error": "No matching track found"}, 0
+    response = {
+        "match": LYRICS_PAGE_MODES[mode],
+        "results": [{
+            "name": track[TRACK_TITLE_COL],
+            "artist_name": track[TRACK_ARTIST_COL],
+            "snippet": track['snippet'],
+            "score": round(-track['rank'], 4), # FTS5 rank is the negated bm25, higher score = better
+        } for track in tracks],
+        "took_ms": round((time.perf_counter() - start_time) * 1000, 1),
+    }
+    if options.get('paginate'):
+        response["next_page_token"] = encode_page_token(mode, snippet, page.cursor) if page.has_more else None
+    return response, 0
+
 def search_in_lyrics_and_display(db_path, query, max_matches_limit):
-    import sqlite3, os, sys
+    """Searches within the lyrics and prints the tracks while they arrive (lyrics loaded per track)."""
     if not db_path or not os.path.exists(db_path):
         print(f"ERROR: Database path '{db_path}' invalid or not set.", file=sys.stderr)
         return
 
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    like_pattern = f"%{query}%"
-    sql = f"""
-        SELECT t."{TRACK_ID_COL}",
-               t."{TRACK_TITLE_COL}" AS name,
-               t."{TRACK_ARTIST_COL}" AS artist_name,
-               l."{LYRICS_TEXT_COL}" AS plain_lyrics
-        FROM "{TRACKS_TABLE}" t
-        JOIN "{LYRICS_TABLE}" l ON t."{TRACK_ID_COL}" = l."{LYRICS_FK_COL}"
-        WHERE l."{LYRICS_TEXT_COL}" LIKE ?
-        LIMIT ?;
-    """
-    cursor.execute(sql, (like_pattern, max_matches_limit))
-    rows = cursor.fetchall()
-    conn.close()
+    profiler = query_profiler
+    owns_profile = profiler.begin('search_lyrics_display', query) if profiler else False
+    conn = open_database(db_path)
+    if profiler:
+        profiler.phase('connect')
+    try:
+        # The trigram index needs at least 3 characters; shorter terms fall back to the scan
+        use_index = LYRICS_INDEX_FTS_TABLE in attach_index(conn, db_path) and len(query) >= 3
+        if profiler:
+            profiler.phase('attach_index')
+        if not use_index:
+            print("INFO: No lyrics index available, scanning all lyrics (this can take a while)...", file=sys.stderr)
+        page = KeysetPage(iter_search_lyrics(conn, query, max_matches_limit + 1, use_index), max_matches_limit)
+        shown = display_results(page, load_lyrics=lambda track: fetch_lyrics_text(conn, track),
+                                max_matches=max_matches_limit)
+        if profiler:
+            profiler.phase('search_and_display')
+        while ask_next_page(page):
+            page = KeysetPage(iter_search_lyrics(conn, query, max_matches_limit + 1, use_index, after=page.cursor),
+                              max_matches_limit)
+            shown += display_results(page, load_lyrics=lambda track: fetch_lyrics_text(conn, track),
+                                     max_matches=max_matches_limit, first_number=shown + 1)
+    except sqlite3.Error as e:
+        print(f"ERROR searching within lyrics: {e}", file=sys.stderr)
+        print("\nAn error occurred during the search. Details above.")
+    finally:
+        conn.close()
+        if owns_profile:
+            profiler.finish(db_path)
+
+# --- Export (bulk results for analytics) ---
+EXPORT_COLUMNS = (TRACK_ID_COL, TRACK_TITLE_COL, TRACK_ARTIST_COL, LYRICS_TEXT_COL)
+EXPORT_FORMATS = {'.arrow': 'arrow', '.feather': 'arrow', '.ipc': 'arrow', '.parquet': 'parquet',
+                  '.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'} # File extension -> format
+
+class ExportWriter:
+    """Writes batches of rows (tuples in the order of columns) as Arrow IPC or Parquet (with pyarrow),
+    CSV or NDJSON. Only the current batch is held in memory."""
+
+    def __init__(self, path, export_format, columns):
+        self.export_format = export_format
+        self.columns = columns
+        self._file = None
+        self._writer = None
+        if export_format in ('arrow', 'parquet'):
+            import pyarrow
+            self._pyarrow = pyarrow
+            fields = [(column, pyarrow.int64() if column == TRACK_ID_COL else pyarrow.string()) for column in columns]
+            self._schema = pyarrow.schema(fields)
+            if export_format == 'arrow':
+                import pyarrow.ipc
+                self._writer = pyarrow.ipc.new_file(path, self._schema)
+            else:
+                import pyarrow.parquet
+                self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+            return
+        self._file = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+        if export_format == 'csv':
+            import csv
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(columns)
+
+    def write(self, rows):
+        if self.export_format in ('arrow', 'parquet'):
+            # Columnar: one array per column for the whole batch
+            arrays = [self._pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), self._schema)]
+            self._writer.write_batch(self._pyarrow.RecordBatch.from_arrays(arrays, schema=self._schema))
+        elif self.export_format == 'csv':
+            self._writer.writerows(rows)
+        else:
+            self._file.write(''.join(json.dumps(dict(zip(self.columns, row)), ensure_ascii=False) + "\n" for row in rows))
 
-    if not rows:
-        print("\nNo matching tracks found.")
+    def close(self):
+        if self.export_format in ('arrow', 'parquet'):
+            self._writer.close()
+        elif self._file is not sys.stdout:
+            self._file.close()
+        else:
+            self._file.flush()
+
+def iter_export_batches(conn, db_path, query, lyrics_query, with_lyrics, batch_rows):
+    """Yields the rows matching query as lists of at most batch_rows tuples (EXPORT_COLUMNS, lyrics None
+    without with_lyrics). A tracks_fts query is read in index order; a lyrics query searches within lyrics
+    like the interactive search (lyrics index if built, otherwise a scan)."""
+    if lyrics_query:
+        use_index = LYRICS_INDEX_FTS_TABLE in attach_index(conn, db_path) and len(query) >= 3
+        rows = ((track[TRACK_ID_COL], track[TRACK_TITLE_COL], track[TRACK_ARTIST_COL],
+                 fetch_lyrics_text(conn, track) if with_lyrics else None)
+                for track in iter_search_lyrics(conn, query, -1, use_index)) # LIMIT -1: no limit
+        for batch in iter(lambda: list(itertools.islice(rows, batch_rows)), []):
+            yield batch
         return
+    lyrics_column = f"""(
+        SELECT l."{LYRICS_TEXT_COL}" FROM "{LYRICS_TABLE}" AS l
+        WHERE l."{LYRICS_FK_COL}" = t."{TRACK_ID_COL}"
+        ORDER BY l."{LYRICS_ID_COL}" DESC
+        LIMIT 1
+    )""" if with_lyrics else "NULL" # The newest lyrics row, like fetch_track_lyrics
+    # No ORDER BY: the matches stream in rowid order straight from the index, nothing is sorted
+    cursor = conn.execute(f"""
+        SELECT t."{TRACK_ID_COL}", t."{TRACK_TITLE_COL}", t."{TRACK_ARTIST_COL}", {lyrics_column}
+        FROM "{FTS_TABLE}" AS f
+        JOIN "{TRACKS_TABLE}" AS t ON t."{TRACK_ID_COL}" = f.rowid
+        WHERE f."{FTS_TABLE}" MATCH ?;
+    """, (query,))
+    for batch in iter(lambda: cursor.fetchmany(batch_rows), []):
+        yield [tuple(row) for row in batch]
+
+def main_export(args):
+    """Streams all results of a query into a file for bulk analysis."""
+    import argparse
+    parser = argparse.ArgumentParser(prog="lyrics-search export",
+                                     description="Write all tracks matching a query as Arrow, Parquet, CSV or NDJSON.")
+    parser.add_argument("query", help="tracks_fts query, e.g. 'artist_name_lower:beatles' (or lyrics text with --lyrics)")
+    parser.add_argument("--lyrics", action="store_true", help="the query is text searched within the lyrics")
+    parser.add_argument("--output", "-o", default="-", metavar="FILE",
+                        help="output file, '-' = stdout (default; CSV/NDJSON only)")
+    parser.add_argument("--format", choices=sorted(set(EXPORT_FORMATS.values())),
+                        help="output format (default: from the file extension, otherwise ndjson)")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_EXPORT_BATCH_ROWS,
+                        help=f"rows per record batch (default: {DEFAULT_EXPORT_BATCH_ROWS})")
+    parser.add_argument("--no-lyrics-text", action="store_true", help="leave out the lyrics column")
+    options = parser.parse_args(args)
+
+    export_format = options.format or EXPORT_FORMATS.get(os.path.splitext(options.output)[1].lower(), 'ndjson')
+    if export_format in ('arrow', 'parquet'):
+        if options.output == '-':
+            parser.error(f"{export_format} needs an output file (--output)")
+        import importlib.util
+        if importlib.util.find_spec("pyarrow") is None:
+            print(f"ERROR: The {export_format} format needs the pyarrow package (pip install pyarrow). "
+                  f"Use --format csv or ndjson instead.", file=sys.stderr)
+            sys.exit(1)
+    if not current_db_path or not os.path.exists(current_db_path):
+        print(f"ERROR: Database path '{current_db_path}' invalid or not set.", file=sys.stderr)
+        sys.exit(1)
 
-    clear_screen()
-    print(f"\nTop {len(rows)} relevant tracks (max {max_matches_limit}) and their lyrics:")
-    print("=" * 40)
-    for i, row in enumerate(rows):
-        print(f"Track {i+1} (ID: {row[TRACK_ID_COL]})")
-        print(f"  Title:  {row['name']}")
-        print(f"  Artist: {row['artist_name']}")
-        print("-" * 20)
-        print("  Lyrics:")
-        for line in row['plain_lyrics'].splitlines():
-            print(f"    {line}")
-        print("=" * 40)
+    columns = EXPORT_COLUMNS[:-1] if options.no_lyrics_text else EXPORT_COLUMNS
+    row_count = 0
+    start_time = time.perf_counter()
+    conn = open_database(current_db_path)
+    writer = None
+    error = None
+    try:
+        writer = ExportWriter(options.output, export_format, columns)
+        for batch in iter_export_batches(conn, current_db_path, options.query, options.lyrics,
+                                         not options.no_lyrics_text, max(1, options.batch_rows)):
+            writer.write([row[:len(columns)] for row in batch] if options.no_lyrics_text else batch)
+            row_count += len(batch)
+    except sqlite3.Error as e:
+        error = f"ERROR exporting '{options.query}': {e}"
+    except OSError as e:
+        error = f"ERROR writing '{options.output}': {e}"
+    finally:
+        if writer:
+            writer.close()
+        conn.close()
+    if error:
+        print(error, file=sys.stderr)
+        if writer and options.output != '-':
+            with contextlib.suppress(OSError):
+                os.remove(options.output) # No partial file (e.g. only the CSV header)
+        sys.exit(1)
+    elapsed = time.perf_counter() - start_time
+    rate = row_count / elapsed if elapsed > 0 else 0.0
+    print(f"INFO: Exported {row_count} rows as {export_format} in {elapsed:.2f}s ({rate:.0f} rows/s).", file=sys.stderr)
+    sys.exit(0)
+
+# --- Benchmark ---
+BENCH_SYLLABLES = ["la", "mo", "ri", "ta", "ven", "sol", "dar", "ke", "mi", "no", "ra", "shi", "tor", "bel", "cu", "fa"]
+
+def generate_synthetic_db(path, rows, seed=1):
+    """Creates an lrclib-shaped DB (tracks, lyrics, tracks_fts) with 'rows' tracks of random but reproducible text."""
+    import random
+    rng = random.Random(seed)
+    vocabulary = [a + b for a in BENCH_SYLLABLES for b in BENCH_SYLLABLES]
+    vocabulary += [a + b + c for a in BENCH_SYLLABLES for b in BENCH_SYLLABLES for c in BENCH_SYLLABLES]
+    rng.shuffle(vocabulary)
+    # Zipf-like word frequencies, like real titles and lyrics
+    cum_weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(vocabulary) + 1)))
+    def words(count):
+        return ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=count))
+    artists = [words(2).title() for _ in range(max(1, rows // 20))]
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF;")
+        conn.execute("PRAGMA synchronous = OFF;")
+        conn.executescript(f"""
+            CREATE TABLE "{TRACKS_TABLE}" (
+                "{TRACK_ID_COL}" INTEGER PRIMARY KEY, "{TRACK_TITLE_COL}" TEXT, name_lower TEXT,
+                "{TRACK_ARTIST_COL}" TEXT, artist_name_lower TEXT, album_name TEXT, album_name_lower TEXT,
+                duration FLOAT, last_lyrics_id INTEGER, created_at DATETIME, updated_at DATETIME
+            );
+            CREATE TABLE "{LYRICS_TABLE}" (
+                "{LYRICS_ID_COL}" INTEGER PRIMARY KEY, "{LYRICS_TEXT_COL}" TEXT, synced_lyrics TEXT,
+                "{LYRICS_FK_COL}" INTEGER, has_plain_lyrics BOOLEAN, has_synced_lyrics BOOLEAN,
+                instrumental BOOLEAN, source TEXT, created_at DATETIME, updated_at DATETIME
+            );
+            CREATE INDEX idx_lyrics_track_id ON "{LYRICS_TABLE}" ("{LYRICS_FK_COL}");
+            CREATE VIRTUAL TABLE "{FTS_TABLE}" USING fts5(
+                name_lower, album_name_lower, artist_name_lower, content='{TRACKS_TABLE}', content_rowid='{TRACK_ID_COL}'
+            );
+        """)
+
+        def track_rows():
+            for track_id in range(1, rows + 1):
+                title = words(rng.randint(1, 4)).title()
+                artist = rng.choice(artists)
+                album = words(rng.randint(1, 3)).title()
+                yield (track_id, title, title.lower(), artist, artist.lower(), album, album.lower(),
+                       float(rng.randint(90, 420)), track_id, '2024-01-01 00:00:00', '2024-01-01 00:00:00')
+
+        def lyrics_rows():
+            for track_id in range(1, rows + 1):
+                lines = [words(rng.randint(4, 8)) for _ in range(rng.randint(6, 14))]
+                plain = '\n'.join(lines)
+                synced = '\n'.join(f"[{i * 4 // 60:02d}:{i * 4 % 60:02d}.00] {line}" for i, line in enumerate(lines))
+                instrumental = rng.random() < 0.02
+                yield (track_id, None if instrumental else plain, None if instrumental else synced, track_id,
+                       not instrumental, not instrumental, instrumental, 'bench', '2024-01-01 00:00:00', '2024-01-01 00:00:00')
+
+        conn.executemany(f'INSERT INTO "{TRACKS_TABLE}" VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);', track_rows())
+        conn.executemany(f'INSERT INTO "{LYRICS_TABLE}" VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);', lyrics_rows())
+        conn.execute(f"INSERT INTO \"{FTS_TABLE}\"(\"{FTS_TABLE}\") VALUES('rebuild');")
+        conn.commit()
+    finally:
+        conn.close()
+
+def add_typo(rng, text):
+    """text with one character dropped, doubled or swapped with its neighbour (for fuzzy queries)."""
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 2)
+    edit = rng.randrange(3)
+    if edit == 0:
+        return text[:i] + text[i + 1:]
+    if edit == 1:
+        return text[:i] + text[i] + text[i:]
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+def build_bench_workload(db_path, queries, lyric_queries, seed=1, fuzzy_queries=0):
+    """Picks a reproducible query mix from the DB: title hits, artist hits, misses, lyric substrings
+    and (for the fuzzy search) titles with artist and a typo."""
+    import random
+    rng = random.Random(seed + 1)
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        max_id = conn.execute(f'SELECT max("{TRACK_ID_COL}") FROM "{TRACKS_TABLE}";').fetchone()[0] or 0
+        max_lyrics_id = conn.execute(f'SELECT max("{LYRICS_ID_COL}") FROM "{LYRICS_TABLE}";').fetchone()[0] or 0
+        # An empty table has nothing to pick from: only the misses are measured then
+        queries_with_hits = queries if max_id else 0
+        fuzzy_queries = fuzzy_queries if max_id else 0
+        lyric_queries = lyric_queries if max_lyrics_id else 0
+        def random_row(sql, max_row_id=max_id):
+            while True:
+                row = conn.execute(sql, (rng.randint(1, max_row_id),)).fetchone()
+                if row and row[0]:
+                    return row[0]
+        workload = []
+        for _ in range(queries_with_hits):
+            title = random_row(f'SELECT "{TRACK_TITLE_COL}" FROM "{TRACKS_TABLE}" WHERE "{TRACK_ID_COL}" = ?;')
+            workload.append(('title', fts_phrase(title)))
+        for _ in range(queries_with_hits):
+            artist = random_row(f'SELECT "{TRACK_ARTIST_COL}" FROM "{TRACKS_TABLE}" WHERE "{TRACK_ID_COL}" = ?;')
+            workload.append(('artist', fts_phrase(artist)))
+        for i in range(queries):
+            workload.append(('miss', f"zzq{rng.randint(0, 10 ** 6)}x{i}"))
+        for _ in range(lyric_queries):
+            lyrics_text = random_row(f'SELECT "{LYRICS_TEXT_COL}" FROM "{LYRICS_TABLE}" WHERE "{LYRICS_ID_COL}" = ?;',
+                                     max_lyrics_id)
+            line_words = rng.choice(lyrics_text.splitlines()).split()
+            start = rng.randint(0, max(0, len(line_words) - 3))
+            workload.append(('lyrics', ' '.join(line_words[start:start + 3])))
+        for _ in range(fuzzy_queries):
+            track_id = random_row(f'SELECT "{TRACK_ID_COL}" FROM "{TRACKS_TABLE}" WHERE "{TRACK_ID_COL}" = ?;')
+            title, artist = conn.execute(f'SELECT "{TRACK_TITLE_COL}", "{TRACK_ARTIST_COL}" FROM "{TRACKS_TABLE}" '
+                                         f'WHERE "{TRACK_ID_COL}" = ?;', (track_id,)).fetchone()
+            workload.append(('fuzzy', f"{add_typo(rng, title or '')} {artist or ''}".strip()))
+    finally:
+        conn.close()
+    rng.shuffle(workload)
+    return workload
+
+def run_bench_query(conn, db_path, kind, query, max_matches, use_lyrics_index):
+    """Runs one workload query to completion (including the lyrics, like the display would)."""
+    if kind == 'lyrics':
+        for track in iter_search_lyrics(conn, query, max_matches, use_lyrics_index):
+            fetch_lyrics_text(conn, track)
+    elif kind == 'fuzzy':
+        fuzzy_search(db_path, query, max_matches, conn=conn)
+    else:
+        search_tracks_and_lyrics(db_path, query, max_matches, conn=conn)
+
+def summarize_latencies(latencies):
+    """Returns p50/p95/p99 (ms) and queries per second of a list of latencies in seconds."""
+    if not latencies:
+        return {"count": 0}
+    ordered = sorted(latencies)
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 3)
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "qps": round(len(ordered) / total, 1) if total > 0 else None,
+    }
+
+def run_bench_pass(db_path, workload, max_matches, cold):
+    """Runs the workload once. Cold: a new connection per query (empty SQLite page cache), warm: one connection."""
+    latencies = collections.defaultdict(list)
+    conn = None if cold else open_database(db_path)
+    use_lyrics_index = False
+    if conn is not None:
+        use_lyrics_index = LYRICS_INDEX_FTS_TABLE in attach_index(conn, db_path)
+    try:
+        for kind, query in workload:
+            start_time = time.perf_counter()
+            if cold:
+                query_conn = open_database(db_path)
+                try:
+                    query_uses_index = LYRICS_INDEX_FTS_TABLE in attach_index(query_conn, db_path)
+                    run_bench_query(query_conn, db_path, kind, query, max_matches, query_uses_index)
+                finally:
+                    query_conn.close()
+            else:
+                run_bench_query(conn, db_path, kind, query, max_matches, use_lyrics_index)
+            latencies[kind].append(time.perf_counter() - start_time)
+    finally:
+        if conn is not None:
+            conn.close()
+    summary = {kind: summarize_latencies(values) for kind, values in sorted(latencies.items())}
+    summary["all"] = summarize_latencies([value for values in latencies.values() for value in values])
+    return summary
+
+def get_peak_rss_mib():
+    """Peak resident set size of this process in MiB (None where the resource module is missing)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024 # Bytes on macOS, KiB elsewhere
+    return round(peak / 1024, 1)
+
+def main_bench(args):
+    """Generates (or reuses) a synthetic DB, runs the query workload cold and warm and prints a JSON report."""
+    global current_index_path, current_compact_db_path
+    import argparse
+    parser = argparse.ArgumentParser(prog="lyrics-search bench", description="Measure search latency and throughput.")
+    parser.add_argument("--rows", type=int, default=10000, help="tracks in the synthetic DB (default: 10000)")
+    parser.add_argument("--queries", type=int, default=200, help="title, artist and miss queries each (default: 200)")
+    parser.add_argument("--lyric-queries", type=int, default=20, help="lyric substring queries (default: 20)")
+    parser.add_argument("--max-matches", type=int, default=DEFAULT_MAX_MATCHES, help=f"results per query (default: {DEFAULT_MAX_MATCHES})")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for data and workload (default: 1)")
+    parser.add_argument("--db", metavar="PATH", help="keep the synthetic DB at PATH and reuse it if it exists")
+    parser.add_argument("--lyrics-index", action="store_true", help="build the lyrics index before measuring")
+    parser.add_argument("--fuzzy-queries", type=int, default=0,
+                        help="title + artist queries with a typo for the fuzzy search, builds the fuzzy index (default: 0)")
+    parser.add_argument("--output", metavar="FILE", help="also write the JSON report to FILE")
+    options = parser.parse_args(args)
+
+    import platform, shutil, tempfile
+    work_dir = tempfile.mkdtemp(prefix="lyrics-search-bench-")
+    try:
+        db_path = options.db or os.path.join(work_dir, "bench.sqlite3")
+        # Keep the user's sidecar files out of it
+        current_index_path = os.path.join(work_dir, INDEX_FILENAME)
+        current_compact_db_path = os.path.join(work_dir, COMPACT_FILENAME)
+
+        generate_seconds = None
+        if not os.path.exists(db_path):
+            print(f"INFO: Generating synthetic database with {options.rows} tracks...", file=sys.stderr)
+            start_time = time.perf_counter()
+            generate_synthetic_db(db_path, options.rows, options.seed)
+            generate_seconds = round(time.perf_counter() - start_time, 2)
+        if options.lyrics_index and not build_lyrics_index(db_path):
+            sys.exit(1)
+        if options.fuzzy_queries > 0 and not build_fuzzy_index(db_path):
+            sys.exit(1)
+
+        workload = build_bench_workload(db_path, options.queries, options.lyric_queries, options.seed,
+                                        options.fuzzy_queries)
+        print(f"INFO: Running {len(workload)} queries cold and warm...", file=sys.stderr)
+        cold = run_bench_pass(db_path, workload, options.max_matches, cold=True)
+        run_bench_pass(db_path, workload, options.max_matches, cold=False) # Warm-up
+        warm = run_bench_pass(db_path, workload, options.max_matches, cold=False)
+
+        with sqlite3.connect(db_path) as conn:
+            track_count = conn.execute(f'SELECT count(*) FROM "{TRACKS_TABLE}";').fetchone()[0]
+        report = {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "rows": track_count,
+            "db_size_mib": round(os.path.getsize(db_path) / 1024 / 1024, 1),
+            "seed": options.seed,
+            "max_matches": options.max_matches,
+            "lyrics_index": options.lyrics_index,
+            "generate_seconds": generate_seconds,
+            "cold": cold,
+            "warm": warm,
+            "peak_rss_mib": get_peak_rss_mib(),
+        }
+        report_json = json.dumps(report, indent=2)
+        print(report_json)
+        if options.output:
+            with open(options.output, 'w', encoding='utf-8') as f:
+                f.write(report_json + "\n")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+# --- Startup Check ---
+# Only needed by other modes, imported inside the functions that use them (keeps 'lookup' starting fast)
+LAZY_IMPORTS = ("argparse", "asyncio", "concurrent.futures", "csv", "hashlib", "http.server", "platform",
+                "pyarrow", "queue", "random", "shutil", "socketserver", "tempfile", "urllib.parse")
+
+def parse_importtime(output):
+    """Parses the stderr of 'python -X importtime'. Returns [(module, self_us, cumulative_us, depth)] in output order."""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue # Header line
+        name = fields[2].rstrip()
+        imports.append((name.strip(), int(fields[0]), int(fields[1]), len(name) - len(name.lstrip())))
+    return imports
+
+def module_import_tree(imports, module):
+    """The entry of module and the entries of everything it imported (listed before it, indented deeper)."""
+    for position in range(len(imports) - 1, -1, -1):
+        if imports[position][0] == module:
+            entry = imports[position]
+            subtree = [entry]
+            for other in reversed(imports[:position]):
+                if other[3] <= entry[3]:
+                    break
+                subtree.append(other)
+            return subtree
+    return []
+
+def run_timed(command, env, runs):
+    """Median wall clock (seconds) of running command runs times, output discarded."""
+    import subprocess
+    timings = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start_time)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def main_startup_check(args):
+    """Measures the start of a lookup (module import and wall clock) and fails if it is over budget."""
+    import argparse
+    import subprocess
+    parser = argparse.ArgumentParser(prog="lyrics-search startup-check",
+                                     description="Check that a lookup starts within its time budget.")
+    parser.add_argument("--runs", type=int, default=5, help="measurements per timing, the median counts (default: 5)")
+    parser.add_argument("--query", default="test", help="search term of the timed lookup (default: test)")
+    parser.add_argument("--import-budget-ms", type=float, default=DEFAULT_STARTUP_IMPORT_BUDGET_MS,
+                        help=f"max. import time of the module (default: {DEFAULT_STARTUP_IMPORT_BUDGET_MS})")
+    parser.add_argument("--lookup-budget-ms", type=float, default=DEFAULT_STARTUP_LOOKUP_BUDGET_MS,
+                        help=f"max. lookup wall clock above a bare interpreter (default: {DEFAULT_STARTUP_LOOKUP_BUDGET_MS})")
+    options = parser.parse_args(args)
+    runs = max(1, options.runs)
+
+    # The child processes have to find this package, also when it is run from a source checkout
+    env = dict(os.environ)
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_parent, env.get("PYTHONPATH")]))
+    module = f"{__package__ or 'lyrics_search'}.main"
+
+    subprocess.run([sys.executable, "-c", f"import {module}"], env=env) # Writes the bytecode cache
+    if env.get("PYTHONDONTWRITEBYTECODE"):
+        print("INFO: PYTHONDONTWRITEBYTECODE is set, the timings include compiling the module.", file=sys.stderr)
+    import_runs = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                env=env, capture_output=True, text=True)
+        import_runs.append(module_import_tree(parse_importtime(result.stderr), module))
+    if not import_runs[0]:
+        print(f"ERROR: Could not measure the import of {module}.", file=sys.stderr)
+        sys.exit(1)
+    import_runs.sort(key=lambda tree: tree[0][2])
+    tree = import_runs[len(import_runs) // 2]
+    import_ms = tree[0][2] / 1000
+    slowest = sorted(tree[1:], key=lambda entry: entry[1], reverse=True)[:5]
+    eager = sorted({entry[0] for entry in tree if entry[0] in LAZY_IMPORTS})
+
+    lookup_ms = None
+    if current_db_path and os.path.exists(current_db_path):
+        bare = run_timed([sys.executable, "-c", "pass"], env, runs)
+        lookup = run_timed([sys.executable, "-m", module, "lookup", options.query], env, runs)
+        lookup_ms = round((lookup - bare) * 1000, 1)
+    else:
+        print("INFO: No database configured, the lookup timing is skipped.", file=sys.stderr)
+
+    problems = []
+    if import_ms > options.import_budget_ms:
+        problems.append(f"import takes {import_ms:.1f} ms (budget {options.import_budget_ms:g} ms)")
+    if lookup_ms is not None and lookup_ms > options.lookup_budget_ms:
+        problems.append(f"lookup takes {lookup_ms:.1f} ms above interpreter start (budget {options.lookup_budget_ms:g} ms)")
+    if eager:
+        problems.append(f"imported at startup but only needed by other modes: {', '.join(eager)}")
+    report = {
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "import_ms": round(import_ms, 1),
+        "import_budget_ms": options.import_budget_ms,
+        "slowest_imports": [{"module": entry[0], "self_ms": round(entry[1] / 1000, 1)} for entry in slowest],
+        "lookup_ms": lookup_ms,
+        "lookup_budget_ms": options.lookup_budget_ms,
+        "problems": problems,
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if problems else 0)
 
 # --- Entry Point ---
 def main():
     """Entry point for the application."""
     # Load configuration *once* at the start
     load_config()
+    configure_profiler()
 
     # Decide mode based on arguments
     if len(sys.argv) == 1:
         # No arguments -> Interactive Mode
         main_interactive()
-    elif len(sys.argv) == 3 and sys.argv[1].lower() == 'lookup':
+    elif len(sys.argv) == 3 and sys.argv[1].lower() == 'lookup' and not sys.argv[2].startswith('--'):
         # Argument 'lookup' + search term -> Lookup Mode
         search_term_arg = sys.argv[2]
         main_lookup(search_term_arg)
+    elif len(sys.argv) >= 3 and sys.argv[1].lower() == 'lookup':
+        # Argument 'lookup' + options (--batch) -> Lookup Mode
+        main_lookup_args(sys.argv[2:])
+    elif len(sys.argv) >= 2 and sys.argv[1].lower() == 'serve':
+        # Argument 'serve' -> persistent lookup server
+        main_serve(sys.argv[2:])
+    elif len(sys.argv) >= 2 and sys.argv[1].lower() == 'bench':
+        # Argument 'bench' -> benchmark against a synthetic DB (no config needed)
+        main_bench(sys.argv[2:])
+    elif len(sys.argv) == 2 and sys.argv[1].lower() in ('optimize', 'extract'):
+        # Argument 'optimize' -> build the compact DB from the dump
+        if not current_db_path:
+            print("ERROR: No database path configured. Run the interactive setup first.", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0 if build_compact_db(current_db_path) else 1)
+    elif len(sys.argv) >= 2 and sys.argv[1].lower() == 'doctor':
+        # Argument 'doctor' -> check schema, query plans and indexes
+        main_doctor(sys.argv[2:])
+    elif len(sys.argv) >= 2 and sys.argv[1].lower() == 'update':
+        # Argument 'update' -> apply a newer dump to the derived data
+        main_update(sys.argv[2:])
+    elif len(sys.argv) >= 2 and sys.argv[1].lower() == 'export':
+        # Argument 'export' -> write all results of a query to a file
+        main_export(sys.argv[2:])
+    elif len(sys.argv) >= 2 and sys.argv[1].lower() == 'startup-check':
+        # Argument 'startup-check' -> measure the start of a lookup against its budget
+        main_startup_check(sys.argv[2:])
+    elif len(sys.argv) >= 2 and sys.argv[1].lower() == 'index':
+        # Argument 'index' -> build indexes into the sidecar DB
+        main_index(sys.argv[2:])
     else:
         # Incorrect or incomplete arguments
         script_name = os.path.basename(sys.argv[0])
         print(f"Usage:", file=sys.stderr)
         print(f"  Interactive mode: python {script_name}", file=sys.stderr)
         print(f"  Lookup mode:      python {script_name} lookup \"<search_term>\"", file=sys.stderr)
+        print(f"  Batch lookup:     python {script_name} lookup --batch [<file>] [--workers <n>]", file=sys.stderr)
+        print(f"  Lyric snippet:    python {script_name} lookup --lyrics \"<words of the lyrics>\"", file=sys.stderr)
+        print(f"  Build index:      python {script_name} index [lyrics|fuzzy|exact|popularity|phrases|fingerprints|all]", file=sys.stderr)
+        print(f"  After a new dump: python {script_name} update", file=sys.stderr)
+        print(f"  Check database:   python {script_name} doctor [--fix]", file=sys.stderr)
+        print(f"  Compact database: python {script_name} optimize", file=sys.stderr)
+        print(f"  Export results:   python {script_name} export \"<query>\" --output <file.parquet|.arrow|.csv|.ndjson>", file=sys.stderr)
+        print(f"  Benchmark:        python {script_name} bench [--rows <n>]", file=sys.stderr)
+        print(f"  Startup budget:   python {script_name} startup-check", file=sys.stderr)
+        print(f"  Lookup server:    python {script_name} serve [--port <port> | --socket <path>]", file=sys.stderr)
         sys.exit(1)
 
 if __name__ == "__main__":